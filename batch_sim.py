@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# validate directory of G-code files by simulating every file on a headless PolarBot.
+# files are distributed across a pool of worker processes, results are written as JSON or CSV.
+# usage: batch_sim.py <dir> [--jobs N] [--pattern *.gcode] [--report report.json] [--record <dir>]
+
+import os
+import sys
+import csv
+import json
+import glob
+import argparse
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor
+
+REPORT_FIELDS = ('file', 'success', 'commands', 'out_of_bounds', 'errors', 'steps_a', 'steps_b', 'ticks', 'est_time_s', 'sim_time_s')
+
+def simulate_text(text, **kwargs):
+    """ run program text on headless bot, returns dict of results """
+    from headless import HeadlessControler
+    from polarbot import PolarBot
+    controler = HeadlessControler(tick_interval = kwargs.get('tick_interval', HeadlessControler.TICK_INTERVAL))
+    bot = PolarBot(controler, width = kwargs.get('width', 800), height = kwargs.get('height', 600))
+    steps = {'A': 0, 'B': 0}
+    pulleys = (bot.pulleyA, bot.pulleyB)
+    def on_step(pulley, angle):
+        if pulley in pulleys:
+            steps[pulley.id] += 1
+    controler.dispatcher.subscribe('step', on_step)
+    # additional executors, e.g. renderers
+    for executor in kwargs.get('executors', ()):
+        bot.add_executor(executor)
+    recorder = None
+    if kwargs.get('record'):
+        from trajectory import TrajectoryRecorder
+        recorder = TrajectoryRecorder(kwargs['record'], bot.pulleyA.get_rads_per_step())
+        bot.add_executor(recorder)
+    result = {'success': True, 'errors': []}
+    started = perf_counter()
+    controler.load_program(text)
+    try:
+        controler.run(kwargs.get('max_ticks'))
+    except Exception as e:
+        result['success'] = False
+        result['errors'].append('line {}: {}'.format(controler.program_line, e))
+    if recorder is not None:
+        bot.rem_executor(recorder)
+        recorder.close()
+    result['sim_time_s'] = perf_counter() - started
+    result['commands'] = len(controler.results)
+    result['out_of_bounds'] = [line for line, text, done in controler.results if not done]
+    result['errors'] += ['line {}: {}'.format(line, error) for line, text, error in controler.errors]
+    result['success'] = result['success'] and not result['out_of_bounds'] and not result['errors']
+    result['steps_a'] = steps['A']
+    result['steps_b'] = steps['B']
+    result['ticks'] = controler.ticks
+    result['est_time_s'] = controler.ticks * controler.get_tick_interval() / 1000
+    return result
+
+def simulate_file(path, **kwargs):
+    """ run G-code file on headless bot, returns dict of results """
+    try:
+        with open(path) as f:
+            text = f.read()
+    except Exception as e:
+        result = {'success': False, 'errors': [str(e)]}
+    else:
+        if kwargs.get('record_dir'):
+            kwargs['record'] = os.path.join(kwargs['record_dir'], os.path.basename(path) + '.pbtr')
+        result = simulate_text(text, **kwargs)
+    result['file'] = path
+    return result
+
+def _simulate_file(args):
+    # unpacks arguments for pool map
+    path, kwargs = args
+    return simulate_file(path, **kwargs)
+
+def simulate_files(paths, jobs = None, **kwargs):
+    """ simulate files in a pool of worker processes, results are in order of paths """
+    if jobs == 1:
+        return [simulate_file(path, **kwargs) for path in paths]
+    with ProcessPoolExecutor(max_workers = jobs) as pool:
+        # one file per task - jobs differ much in length so chunking would unbalance workers
+        return list(pool.map(_simulate_file, [(path, kwargs) for path in paths]))
+
+def find_files(directory, patterns):
+    paths = set()
+    for pattern in patterns:
+        paths.update(glob.glob(os.path.join(directory, pattern)))
+    return sorted(paths)
+
+def write_report(results, path):
+    if path.lower().endswith('.csv'):
+        with open(path, 'w', newline = '') as f:
+            writer = csv.DictWriter(f, fieldnames = REPORT_FIELDS, extrasaction = 'ignore')
+            writer.writeheader()
+            for result in results:
+                row = dict(result)
+                row['out_of_bounds'] = ' '.join(str(line) for line in result.get('out_of_bounds', []))
+                row['errors'] = '; '.join(result.get('errors', []))
+                writer.writerow(row)
+    else:
+        with open(path, 'w') as f:
+            json.dump(results, f, indent = 2)
+
+def main():
+    parser = argparse.ArgumentParser(description = 'simulate G-code files on headless PolarBot')
+    parser.add_argument('directory')
+    parser.add_argument('--pattern', default = '*.gcode,*.nc,*.txt', help = 'comma separated file patterns')
+    parser.add_argument('--jobs', type = int, default = None, help = 'number of worker processes, all cores by default')
+    parser.add_argument('--report', default = 'report.json', help = 'report file, .json or .csv')
+    parser.add_argument('--max-ticks', type = int, default = None, help = 'fail jobs longer than this number of ticks')
+    parser.add_argument('--record', default = None, help = 'directory to write trajectory of every file to')
+    args = parser.parse_args()
+
+    paths = find_files(args.directory, args.pattern.split(','))
+    if not paths:
+        print('no files found in {}'.format(args.directory))
+        return 1
+    started = perf_counter()
+    if args.record:
+        os.makedirs(args.record, exist_ok = True)
+    results = simulate_files(paths, args.jobs, max_ticks = args.max_ticks, record_dir = args.record)
+    elapsed = perf_counter() - started
+    write_report(results, args.report)
+    failed = [result for result in results if not result['success']]
+    print('{} files simulated in {:.2f}s, {} failed, report: {}'.format(len(results), elapsed, len(failed), args.report))
+    for result in failed:
+        print('FAIL {} out of bounds lines={} errors={}'.format(result['file'], result.get('out_of_bounds', []), result.get('errors', [])))
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# emit/dispatch throughput of event_dispatcher
+# usage: bench_dispatch.py [--impl path/to/event_dispatcher.py] [--events N] [--handlers N] [--immediate]
+# --impl allows to compare with other revision of dispatcher, e.g.
+#   git show <rev>:event_dispatcher.py > /tmp/old_dispatcher.py
+#   python benchmarks/bench_dispatch.py --impl /tmp/old_dispatcher.py
+
+import os
+import sys
+import argparse
+import importlib.util
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def load_dispatcher(path):
+    if not path:
+        import event_dispatcher as module
+    else:
+        spec = importlib.util.spec_from_file_location('bench_event_dispatcher', path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    if hasattr(module.EventDispatcher, 'default'):
+        return module.EventDispatcher()
+    # old revisions - singleton with class level api
+    return module.EventDispatcher
+
+def bench_emit(dispatcher, events, handlers, immediate = False, batch = 100):
+    counter = [0]
+    def on_step(id, angle):
+        counter[0] += 1
+    dispatcher.add_event('bench_step')
+    if immediate:
+        dispatcher.set_event_mode('bench_step', dispatcher.IMMEDIATE)
+    for i in range(handlers):
+        # use only api common to all revisions
+        registry = dispatcher._events if '_events' in vars(dispatcher) else dispatcher._root._events
+        registry['bench_step'] += on_step
+    started = perf_counter()
+    for i in range(events // batch):
+        for j in range(batch):
+            dispatcher.trigger_event('bench_step', 'A', 0.001)
+        dispatcher.dispatch()
+    elapsed = perf_counter() - started
+    dispatcher.rem_event('bench_step')
+    assert counter[0] == (events // batch) * batch * handlers
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description = 'event dispatcher emit throughput')
+    parser.add_argument('--impl', default = None, help = 'path to event_dispatcher.py to benchmark')
+    parser.add_argument('--events', type = int, default = 200000)
+    parser.add_argument('--handlers', type = int, default = 1)
+    parser.add_argument('--repeat', type = int, default = 5)
+    parser.add_argument('--immediate', action = 'store_true', help = 'deliver events bypassing the queue')
+    args = parser.parse_args()
+    dispatcher = load_dispatcher(args.impl)
+    best = min(bench_emit(dispatcher, args.events, args.handlers, args.immediate) for i in range(args.repeat))
+    print('impl={} events={} handlers={} immediate={} best={:.4f}s rate={:.0f} events/s'.format(
+        args.impl or 'event_dispatcher', args.events, args.handlers, args.immediate, best, args.events / best))
+
+if __name__ == '__main__':
+    main()
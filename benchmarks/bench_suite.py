@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# benchmark suite: imports, parsing, planning, stepping, dispatch and rendering on generated workloads.
+# usage: bench_suite.py [--save] [--baseline benchmarks/baseline.json] [--tolerance 0.3] [--only name,...]
+# results are compared with stored baseline, exit code is 1 when some benchmark regressed.
+# rates are compared relative to a pure Python reference loop run in the same process, so a
+# baseline saved on another machine or interpreter still catches regressions of the code.
+# baseline keeps interpreter and machine it was saved on next to the results.
+
+import os
+import sys
+import json
+import argparse
+import platform
+import subprocess
+from time import perf_counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import workloads
+from event_dispatcher import EventDispatcher
+from headless import HeadlessControler
+from polarbot import Command, PolarBot, WIDTH, HEIGHT
+from polarbot.view import ViewState
+from executor import Executor
+from batch_sim import simulate_text
+from preflight import estimate_text, IncrementalEstimator, parse_program, segment_steps
+import step_kernel
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+def best_time(func, repeat):
+    best = None
+    for i in range(repeat):
+        started = perf_counter()
+        func()
+        elapsed = perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def bench_reference(repeat, count = 200000):
+    """ pure Python float loop independent of polarbot code, speed of interpreter and machine, loops/s """
+    def run():
+        x = 0.0
+        for i in range(count):
+            x = x * 0.5 + i % 7
+        return x
+    return count / best_time(run, repeat)
+
+def machine_info():
+    """ interpreter and machine results are measured on """
+    info = {'python': platform.python_version(), 'implementation': platform.python_implementation(),
+            'system': platform.platform(), 'machine': platform.machine(), 'processor': platform.processor(),
+            'cpus': os.cpu_count()}
+    # optional accelerators change rates of estimate and kernel benchmarks
+    for module in ('numpy', 'numba'):
+        try:
+            info[module] = __import__(module).__version__
+        except ImportError:
+            info[module] = None
+    return info
+
+def all_lines():
+    lines = []
+    for name, generator in workloads.WORKLOADS.items():
+        lines += generator()
+    return lines
+
+def bench_parse(repeat):
+    """ Command.parse throughput, lines/s """
+    lines = all_lines()
+    def run():
+        for line in lines:
+            Command(cmd_text = line)
+    return len(lines) / best_time(run, repeat)
+
+def bench_plan(repeat):
+    """ PolarBot.plan_cmd planning cost (segmentation and angles of all segments), commands/s """
+    commands = [Command(cmd_text = line) for line in all_lines()]
+    def run():
+        bot = PolarBot(HeadlessControler())
+        for cmd in commands:
+            bot.plan_cmd(cmd)
+    return len(commands) / best_time(run, repeat)
+
+def bench_calc_angles(repeat):
+    """ PolarBot.calc_target_angles, calls/s """
+    bot = PolarBot(HeadlessControler())
+    points = [Command(cmd_text = line).p for line in workloads.spiral()]
+    def run():
+        for p in points:
+            bot.tool_position.set(p.x, p.y)
+            bot.calc_target_angles()
+    return len(points) / best_time(run, repeat)
+
+def bench_step(repeat):
+    """ on_tick stepping of whole programs on headless bot, microsteps/s """
+    text = workloads.text(workloads.spiral(turns = 3) + workloads.long_travel(count = 4) + workloads.tiny_strokes(count = 200))
+    steps = [0]
+    def run():
+        result = simulate_text(text)
+        steps[0] = result['steps_a'] + result['steps_b']
+    elapsed = best_time(run, repeat)
+    return steps[0] / elapsed
+
+def bench_dispatch(repeat, events = 100000, batch = 100):
+    """ EventDispatcher emit + dispatch of deferred events, events/s """
+    dispatcher = EventDispatcher()
+    counter = [0]
+    def on_event(id, angle):
+        counter[0] += 1
+    dispatcher.subscribe('bench', on_event)
+    def run():
+        for i in range(events // batch):
+            for j in range(batch):
+                dispatcher.emit('bench', 'A', 0.001)
+            dispatcher.dispatch()
+    return events / best_time(run, repeat)
+
+def bench_estimate(repeat):
+    """ preflight estimate of program text, including parsing, lines/s """
+    text = workloads.text(all_lines())
+    lines = text.count('\n') + 1
+    return lines / best_time(lambda: estimate_text(text), repeat)
+
+def bench_reestimate(repeat, edits = 20):
+    """ IncrementalEstimator.update after one line edit of long program, edits/s """
+    lines = workloads.spiral(turns = 200)
+    estimator = IncrementalEstimator(PolarBot(HeadlessControler()))
+    estimator.update(workloads.text(lines))
+    def run():
+        for i in range(edits):
+            lines[len(lines) // 2] = 'G1 X{:.3f} Y300.000'.format(400 + i % 2)
+            estimator.update(workloads.text(lines))
+    return edits / best_time(run, repeat)
+
+def bench_kernel(repeat):
+    """ step_kernel.step_stream of planned segments of all workloads, microsteps/s """
+    steps_a, steps_b = segment_steps(parse_program(workloads.text(all_lines())), PolarBot(HeadlessControler()))
+    steps = [0]
+    def run():
+        # segments are cached during the call only
+        step_kernel._cache.clear()
+        steps[0] = sum(step_kernel.step_counts(step_kernel.step_stream(steps_a, steps_b))[:2])
+    elapsed = best_time(run, repeat)
+    return steps[0] / elapsed
+
+def bench_import(repeat, modules = ('polarbot', 'headless')):
+    """ import of Tk-free core and headless controler by a fresh interpreter, imports/s """
+    best = None
+    for i in range(repeat):
+        output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + ', '.join(modules)],
+                                cwd = ROOT, stderr = subprocess.PIPE, universal_newlines = True, check = True).stderr
+        # cumulative microseconds of top level imports, nested ones are indented
+        total = 0
+        for line in output.splitlines():
+            fields = line.split('|')
+            if len(fields) == 3 and fields[2][1:] in modules:
+                total += int(fields[1])
+        best = total if best is None else min(best, total)
+    return 1e6 / best
+
+class AngleCollector(Executor):
+    """ executor keeping angles of bot updates """
+    batch_updates = True
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.angles = []
+
+    def update_batch(self, angles):
+        self.angles.extend(angles[:self.limit - len(self.angles)])
+
+def bench_render(repeat, updates = 20000):
+    """ ViewState.update_pose of Visualiser.update, forward kinematics, screen mapping and tool path
+        on step by step angles, updates/s """
+    bot = PolarBot(HeadlessControler())
+    view = ViewState(WIDTH, HEIGHT, bot.pulleyA.get_rads_per_step())
+    view.set_geometry(bot.area_width, bot.area_height, bot.mount_point, bot.armA_len)
+    collector = AngleCollector(updates)
+    simulate_text(workloads.text(workloads.spiral()), executors = [collector])
+    angles = collector.angles
+    # tool path starts at the first pose
+    view.update_pose(*angles[0])
+    view.set_tool(True)
+    def run():
+        for a, b in angles:
+            view.update_pose(a, b)
+    return len(angles) / best_time(run, repeat)
+
+BENCHMARKS = {
+    'parse_lines_per_s': bench_parse,
+    'plan_cmds_per_s': bench_plan,
+    'calc_angles_per_s': bench_calc_angles,
+    'step_microsteps_per_s': bench_step,
+    'dispatch_events_per_s': bench_dispatch,
+    'render_updates_per_s': bench_render,
+    'estimate_lines_per_s': bench_estimate,
+    'reestimate_edits_per_s': bench_reestimate,
+    'kernel_steps_per_s': bench_kernel,
+    'core_imports_per_s': bench_import,
+}
+
+def run_benchmarks(names, repeat):
+    results = {}
+    for name in names:
+        results[name] = BENCHMARKS[name](repeat)
+        print('{:<24} {:>14.0f}'.format(name, results[name]))
+    return results
+
+def compare(results, reference, baseline, tolerance):
+    """ returns names of benchmarks slower than baseline by more than tolerance,
+        rates are divided by rates of reference loop of the run and of the baseline """
+    if baseline['machine'] != machine_info():
+        print('baseline was saved on {}'.format(baseline['machine']))
+    speed = reference / baseline['reference_per_s']
+    print('{:<24} {:>6.2f}x baseline'.format('reference_per_s', speed))
+    regressed = []
+    for name, rate in results.items():
+        if name not in baseline['results']:
+            continue
+        ratio = rate / baseline['results'][name] / speed
+        status = 'REGRESSION' if ratio < 1 - tolerance else 'ok'
+        print('{:<24} {:>6.2f}x baseline {}'.format(name, ratio, status))
+        if status != 'ok':
+            regressed.append(name)
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description = 'polarbot benchmark suite')
+    parser.add_argument('--baseline', default = DEFAULT_BASELINE)
+    parser.add_argument('--save', action = 'store_true', help = 'store results as new baseline')
+    parser.add_argument('--tolerance', type = float, default = 0.3, help = 'allowed slowdown relative to baseline')
+    parser.add_argument('--repeat', type = int, default = 5)
+    parser.add_argument('--only', default = None, help = 'comma separated benchmark names')
+    args = parser.parse_args()
+
+    names = args.only.split(',') if args.only else list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            parser.error('unknown benchmark "{}". must be one of {}'.format(name, tuple(BENCHMARKS)))
+    reference = bench_reference(args.repeat)
+    results = run_benchmarks(names, args.repeat)
+    if args.save:
+        baseline = {'results': {}}
+        if args.only and os.path.exists(args.baseline):
+            # results of other benchmarks are kept, they were measured relative to the stored reference
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+            speed = reference / baseline['reference_per_s']
+            results = {name: rate / speed for name, rate in results.items()}
+        else:
+            baseline['machine'] = machine_info()
+            baseline['reference_per_s'] = reference
+        baseline['results'].update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent = 2, sort_keys = True)
+        print('baseline saved to {}'.format(args.baseline))
+        return 0
+    if not os.path.exists(args.baseline):
+        print('no baseline {}, run with --save to create it'.format(args.baseline))
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    return 1 if compare(results, reference, baseline, args.tolerance) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# generated G-code workloads for benchmarks.
+# all points are inside the working area of the default 800x600 bot and keep
+# away from the mount point (400,100) where kinematics is singular.
+
+from math import pi, cos, sin
+import random
+
+# drawing window
+X_MIN, X_MAX = 200, 600
+Y_MIN, Y_MAX = 150, 400
+
+def _fmt(cmd, x, y):
+    return '{} X{:.3f} Y{:.3f}'.format(cmd, x, y)
+
+def hatch(spacing = 2.0):
+    """ dense hatch fill of the drawing window """
+    lines = []
+    y = Y_MIN
+    forward = True
+    while y <= Y_MAX:
+        x0, x1 = (X_MIN, X_MAX) if forward else (X_MAX, X_MIN)
+        lines.append(_fmt('G0', x0, y))
+        lines.append(_fmt('G1', x1, y))
+        forward = not forward
+        y += spacing
+    return lines
+
+def spiral(turns = 20, points_per_turn = 72, center = (400, 300), radius = 140):
+    """ archimedean spiral from center outwards """
+    lines = [_fmt('G0', *center)]
+    total = turns * points_per_turn
+    for i in range(1, total + 1):
+        a = 2 * pi * i / points_per_turn
+        r = radius * i / total
+        lines.append(_fmt('G1', center[0] + r * cos(a), center[1] + r * sin(a)))
+    return lines
+
+def tiny_strokes(count = 2000, length = 0.5, seed = 1):
+    """ many short strokes scattered over the drawing window """
+    rnd = random.Random(seed)
+    lines = []
+    for i in range(count):
+        x = rnd.uniform(X_MIN, X_MAX - length)
+        y = rnd.uniform(Y_MIN, Y_MAX - length)
+        lines.append(_fmt('G0', x, y))
+        lines.append(_fmt('G1', x + length, y + length))
+    return lines
+
+def long_travel(count = 50):
+    """ long travel moves between opposite corners of the drawing window """
+    lines = []
+    for i in range(count):
+        lines.append(_fmt('G0', X_MIN, Y_MIN) if i % 2 == 0 else _fmt('G0', X_MAX, Y_MAX))
+        lines.append(_fmt('G1', X_MAX, Y_MIN) if i % 2 == 0 else _fmt('G1', X_MIN, Y_MAX))
+    return lines
+
+WORKLOADS = {
+    'hatch': hatch,
+    'spiral': spiral,
+    'tiny_strokes': tiny_strokes,
+    'long_travel': long_travel,
+}
+
+def text(lines):
+    return '\n'.join(lines)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# seek and resume of programs.
+# pulleys move by whole steps, so after every command the arm angles are the step grid point
+# nearest to angles of the command target. state of bot before any line is therefore given by
+# the last command before it which was inside bounds: its target, pen state and rounded angles,
+# and by the last F before it, feed is modal.
+# PolarBot.state_at() finds that command scanning back from the line, checkpoints saved
+# during a run bound the scan and keep the step grid of the original run.
+#
+# checkpoint file has one JSON object per line:
+#   {"program": crc32 of program text, "line": next line to run, "x": .., "y": ..,
+#    "angleA": .., "angleB": .., "pen": .., "origin": [angle A, angle B of step grid], "feed": mm/min}
+#
+# usage: checkpoint.py <program.gcode> --line N [--checkpoints file]   resume headless run from line N
+
+import os
+import sys
+import json
+import zlib
+import argparse
+
+def program_id(text):
+    """ identifies program text of checkpoints """
+    return zlib.crc32(text.encode('utf-8'))
+
+class CheckpointLog:
+    """ append only file of checkpoints """
+    def __init__(self, path, program = None, truncate = False):
+        self.path = path
+        self.program = program
+        if truncate and os.path.exists(path):
+            os.remove(path)
+
+    def append(self, state):
+        state = dict(state, program = self.program)
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(state) + '\n')
+
+    def last(self, line = None):
+        """ last checkpoint of program at or before line, None when there is none """
+        if not os.path.exists(self.path):
+            return None
+        result = None
+        with open(self.path) as f:
+            for text in f:
+                try:
+                    state = json.loads(text)
+                except ValueError:
+                    # last line may be cut by crash
+                    continue
+                if state.get('program') != self.program:
+                    continue
+                if line is None or state['line'] <= line:
+                    result = state
+        return result
+
+def main():
+    parser = argparse.ArgumentParser(description = 'resume G-code program from line on headless PolarBot')
+    parser.add_argument('path')
+    parser.add_argument('--line', type = int, required = True, help = 'first line to run')
+    parser.add_argument('--checkpoints', default = None, help = 'checkpoint file of previous run')
+    args = parser.parse_args()
+
+    from time import perf_counter
+    from headless import HeadlessControler
+    from polarbot import PolarBot
+    with open(args.path) as f:
+        text = f.read()
+    controler = HeadlessControler()
+    bot = PolarBot(controler)
+    controler.load_program(text)
+    checkpoint = CheckpointLog(args.checkpoints, program_id(text)).last(args.line) if args.checkpoints else None
+    started = perf_counter()
+    controler.seek(args.line, checkpoint)
+    print('seek to line {} in {:.1f}ms, from checkpoint at line {}'.format(
+        args.line, (perf_counter() - started) * 1000, checkpoint['line'] if checkpoint else None))
+    controler.run()
+    print('commands={} errors={} ticks={}'.format(len(controler.results), len(controler.errors), controler.ticks))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
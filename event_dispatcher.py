@@ -1,98 +1,219 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-class MetaEventDispatcher(type):
-    def __getattr__(cls, name):
-        return cls._root.__getattr__(name)
-        
-    def __setattr__(cls, name, value):
-        if hasattr(cls, name):
-            super().__setattr__(name, value)
-        else:
-            cls._root.__setattr__(name, value)
+import logging
+import weakref
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+class StrongRef:
+    """ reference with the same interface as weakref, keeps object alive """
+    __slots__ = ('_obj',)
+
+    def __init__(self, obj):
+        self._obj = obj
+
+    def __call__(self):
+        return self._obj
 
 class EventHandler:
-    def __init__(self):
-        self._handlers = []
-        
+    def __init__(self, name = None):
+        self._name = name
+        # delivery mode and priority of deferred delivery
+        self.mode = EventDispatcher.DEFERRED
+        # emit checks the flag instead of comparing mode
+        self.immediate = False
+        self.priority = 0
+        # references to handlers are kept as a tuple so emit iterates it without copying
+        self._handlers = ()
+
+    def subscribe(self, handler, weak = True):
+        """ add handler to the end of handler list
+            bound methods are referenced weakly unless weak is False, so subscription
+            does not keep the owner alive and is removed when the owner is collected """
+        if weak and hasattr(handler, '__self__') and hasattr(handler, '__func__'):
+            ref = weakref.WeakMethod(handler, self._prune)
+        else:
+            ref = StrongRef(handler)
+        self._handlers = self._handlers + (ref,)
+
+    def unsubscribe(self, handler):
+        """ remove handler from handler list """
+        for ref in self._handlers:
+            if ref() == handler:
+                self._handlers = tuple(r for r in self._handlers if r is not ref)
+                return
+        raise ValueError('handler {} is not subscribed'.format(handler))
+
+    def _prune(self, dead_ref = None):
+        # called by weakref when owner of handler is collected
+        self._handlers = tuple(ref for ref in self._handlers if ref is not dead_ref and ref() is not None)
+
     def __iadd__(self, handler):
-        print(f'add,{handler}')
-        self._handlers.append(handler)
+        self.subscribe(handler)
         return self
-        
+
     def __isub__(self, handler):
-        self._handlers.remove(handler)
+        self.unsubscribe(handler)
         return self
-        
+
+    def __len__(self):
+        return len(self._handlers)
+
     def __call__(self, *args, **keywargs):
-        for handler in self._handlers:
-            handler(*args, **keywargs)
+        for ref in self._handlers:
+            handler = ref()
+            if handler is not None:
+                handler(*args, **keywargs)
 
 class Event:
+    __slots__ = ('name', 'args', 'kwargs')
+
     def __init__(self, event_name, args, kwargs):
-        self._name = event_name
-        self._args = args
-        self._kwargs = kwargs
-        
-    def __getattr__(self, name):
-        inname = '_' + name
-        if inname in self.__dict__:
-            return self.__dict__[inname]
-        else:
-            raise AttributeError('Attribute "{}" not found'.format(name))
-            
-class EventDispatcher(metaclass = MetaEventDispatcher):
+        self.name = event_name
+        self.args = args
+        self.kwargs = kwargs
+
+class EventDispatcher:
+    # event delivery modes
+    # queued until next dispatch() call
+    DEFERRED = 'deferred'
+    # handlers are called directly from emit()
+    IMMEDIATE = 'immediate'
+    MODES = (DEFERRED, IMMEDIATE)
+
+    # process wide dispatcher used by objects which are not given their own one
     _root = None
-    
-    def __new__(cls):
-        if not cls._root:
-            cls._root = super().__new__(cls)
-        return cls._root
-        
+
     def __init__(self):
-        self.__dict__['_events'] = {}
-        self.__dict__['_queue'] = []
-        
-    def __getattr__(self, name):
-        print(f'getattr,{name}')
-        if name not in self.__dict__['_events']:
-            #self.__dict__['_events'][name] = EventHandler()
-            self._events[name] = EventHandler()
-        return self.__dict__['_events'][name]
-            
-    def __setattr__(self, name, value):
-        print(f'setattr,{name},{value}')
-        if name not in self.__dict__['_events']:
-            self.__dict__['_events'][name] = EventHandler()
-        super().__setattr__(name, value)
-    
+        self._events = {}
+        # deferred queues by priority, priorities are kept sorted from high to low
+        self._queues = {0: deque()}
+        self._priorities = [0]
+
     @classmethod
-    def add_event(cls, event_name):
+    def default(cls):
+        """ process wide dispatcher """
+        if cls._root is None:
+            cls._root = cls()
+        return cls._root
+
+    def add_event(self, event_name, mode = None, priority = None):
         """ add new event """
-        if event_name not in cls._root._events:
-            cls._root._events[event_name] = EventHandler()
-            
-    @classmethod
-    def rem_event(cls, event_name):
+        if event_name not in self._events:
+            self._events[event_name] = EventHandler(event_name)
+        if mode is not None or priority is not None:
+            self.set_event_mode(event_name, mode, priority)
+        return self._events[event_name]
+
+    def set_event_mode(self, event_name, mode = None, priority = None):
+        """ set delivery mode and priority of deferred delivery for event """
+        if event_name not in self._events:
+            raise AttributeError('Event "{}" not found'.format(event_name))
+        handler = self._events[event_name]
+        if mode is not None:
+            if mode not in EventDispatcher.MODES:
+                raise ValueError('invalid event mode "{}". must be one of {}'.format(mode, EventDispatcher.MODES))
+            handler.mode = mode
+            handler.immediate = mode == EventDispatcher.IMMEDIATE
+        if priority is not None:
+            if priority not in self._queues:
+                self._queues[priority] = deque()
+                self._priorities = sorted(self._queues, reverse = True)
+            handler.priority = priority
+
+    def rem_event(self, event_name):
         """ remove event """
-        if event_name in cls._root._events:
-            del(cls._root._events[event_name])
-            
-    @classmethod
-    def trigger_event(cls, event_name, *args, **kwargs):
-        """ trigger an event - add event to queue """
+        if event_name in self._events:
+            del(self._events[event_name])
+
+    def has_event(self, event_name):
+        return event_name in self._events
+
+    def subscribe(self, event_name, handler, weak = True):
+        """ subscribe handler to event, event is created if not exists
+            bound methods are referenced weakly by default """
+        self.add_event(event_name).subscribe(handler, weak)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('subscribe event=%s handler=%r', event_name, handler)
+
+    def unsubscribe(self, event_name, handler):
+        """ unsubscribe handler from event """
+        if event_name not in self._events:
+            raise AttributeError('Event "{}" not found'.format(event_name))
+        self._events[event_name].unsubscribe(handler)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('unsubscribe event=%s handler=%r', event_name, handler)
+
+    def emit(self, event_name, *args, **kwargs):
+        """ emit an event - add event to queue or call handlers of immediate event """
         # check event name
-        if event_name in cls._root._events:
-            cls._root._queue.append(Event(event_name, args, kwargs))
+        handler = self._events.get(event_name)
+        if handler is None:
+            raise AttributeError('Event "{}" not found'.format(event_name))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('emit event=%s mode=%s args=%r kwargs=%r', event_name, handler.mode, args, kwargs)
+        if handler.immediate:
+            handler(*args, **kwargs)
         else:
+            self._queues[handler.priority].append(Event(event_name, args, kwargs))
+
+    # old name of emit
+    trigger_event = emit
+
+    def emit_now(self, event_name, *args, **kwargs):
+        """ call handlers of event bypassing the queue regardless of event mode """
+        handler = self._events.get(event_name)
+        if handler is None:
             raise AttributeError('Event "{}" not found'.format(event_name))
-            
-    @classmethod
-    def dispatch(cls):
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('emit_now event=%s args=%r kwargs=%r', event_name, args, kwargs)
+        handler(*args, **kwargs)
+
+    def handler_count(self, event_name = None):
+        """ number of live handlers of event or of all events """
+        if event_name is not None:
+            if event_name not in self._events:
+                raise AttributeError('Event "{}" not found'.format(event_name))
+            return len(self._events[event_name])
+        return sum(len(handler) for handler in self._events.values())
+
+    def queue_size(self):
+        """ number of deferred events waiting for dispatch """
+        return sum(len(queue) for queue in self._queues.values())
+
+    def discard(self, event_name = None):
+        """ drop deferred events of name waiting for dispatch, all of them when name is None.
+            returns number of dropped events """
+        dropped = 0
+        for priority, queue in self._queues.items():
+            if event_name is None:
+                kept = deque()
+            else:
+                kept = deque(event for event in queue if event.name != event_name)
+            dropped += len(queue) - len(kept)
+            self._queues[priority] = kept
+        return dropped
+
+    def _next_event(self):
+        # pop oldest event with the highest priority
+        queues = self._queues
+        for priority in self._priorities:
+            queue = queues[priority]
+            if queue:
+                return queue.popleft()
+        return None
+
+    def dispatch(self):
         """ dispatch events """
-        while len(cls._root._queue) > 0:
-            event = cls._root._queue.pop(0)
-            cls._root._events[event.name](*event.args, **event.kwargs)
-            
-EventDispatcher()
+        events = self._events
+        trace = logger.isEnabledFor(logging.DEBUG)
+        next_event = self._next_event
+        event = next_event()
+        while event is not None:
+            if trace:
+                logger.debug('dispatch event=%s args=%r kwargs=%r', event.name, event.args, event.kwargs)
+            events[event.name](*event.args, **event.kwargs)
+            event = next_event()
 
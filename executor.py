@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# executors are objects driven by PolarBot: visualiser, recorders, hardware drivers.
+# methods of executor are resolved once when it is added to the bot, updates are
+# delivered directly, rate limited or in batches depending on executor options.
+
+from time import perf_counter
+
+class Executor:
+    """ base class of PolarBot executors, all methods are optional """
+    # receive update_batch() with list of (angleA, angleB) instead of update() per step
+    batch_updates = False
+    # max number of deliveries per second, None - no limit.
+    # not batched executor gets only the latest angles when limited
+    max_rate = None
+
+    def init(self, width, height, mount_point, arm_len):
+        # called by bot when executor is added
+        pass
+
+    def update(self, angleA, angleB, force_redraw = False):
+        pass
+
+    def update_batch(self, angles):
+        for angleA, angleB in angles:
+            self.update(angleA, angleB)
+
+    def set_tool(self, state = True):
+        pass
+
+    def set_feed(self, feed):
+        # feed of following segments in mm/min, lowered by bot where a pulley would exceed its max speed
+        pass
+
+    def clear(self):
+        pass
+
+class ExecutorBinding:
+    """ executor with resolved methods and delivery state """
+    ACTIONS = ('update', 'update_batch', 'set_tool', 'set_feed', 'clear')
+
+    def __init__(self, executor, batch = None, max_rate = None):
+        self.executor = executor
+        # methods are resolved once, missing methods are None
+        self.actions = {name: getattr(executor, name, None) for name in ExecutorBinding.ACTIONS}
+        self.batch = getattr(executor, 'batch_updates', False) if batch is None else batch
+        self.max_rate = getattr(executor, 'max_rate', None) if max_rate is None else max_rate
+        self.min_interval = 1 / self.max_rate if self.max_rate else 0.0
+        self.update = self.actions['update']
+        self.update_batch = self.actions['update_batch']
+        if self.update_batch is None and self.update is not None:
+            self.update_batch = self._update_each
+        # executor has a method to receive updates
+        self.receives = (self.update_batch if self.batch else self.update) is not None
+        # every update goes directly to executor
+        self.direct = self.receives and not self.batch and not self.min_interval
+        self.pending = []
+        self.last_delivery = 0.0
+
+    def _update_each(self, angles):
+        for angleA, angleB in angles:
+            self.update(angleA, angleB)
+
+    def push(self, angles):
+        """ angles of next step, delivered according to options of executor """
+        if not self.receives:
+            return
+        if self.batch:
+            self.pending.append(angles)
+            if self.min_interval and perf_counter() - self.last_delivery >= self.min_interval:
+                self.flush()
+        else:
+            now = perf_counter()
+            if now - self.last_delivery >= self.min_interval:
+                self.pending = []
+                self.last_delivery = now
+                self.update(*angles)
+            else:
+                # only the latest angles are kept until next delivery
+                self.pending = [angles]
+
+    def flush(self):
+        """ deliver pending updates """
+        if not self.pending:
+            return
+        pending = self.pending
+        self.pending = []
+        self.last_delivery = perf_counter()
+        if self.batch:
+            self.update_batch(pending)
+        else:
+            self.update(*pending[-1])
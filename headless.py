@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# controler for running PolarBot without Tk main loop.
+# ticks are executed back to back, the same way as ControlPanel.tick does it
+# every TICK_INTERVAL milliseconds, so tick count gives the machine time of a job.
+
+from functools import partial
+from event_dispatcher import EventDispatcher
+from metrics import Metrics
+from line_profile import LineProfile
+import polarbot
+
+class HeadlessControler:
+    ACTIONS = polarbot.ACTIONS
+    TICK_INTERVAL = polarbot.TICK_INTERVAL
+    LOOKAHEAD = polarbot.LOOKAHEAD
+    CHECKPOINT_LINES = polarbot.CHECKPOINT_LINES
+
+    def __init__(self, **kwargs):
+        self._actions = {}
+        self.tick_interval = kwargs.get('tick_interval', HeadlessControler.TICK_INTERVAL)
+        # number of commands sent to bot ahead of the running one
+        self.lookahead = kwargs.get('lookahead', HeadlessControler.LOOKAHEAD)
+        # every controler has its own dispatcher so many bots can run in one process
+        self.dispatcher = kwargs.get('dispatcher') or EventDispatcher()
+        self.metrics = kwargs.get('metrics') or Metrics()
+        # costs of program lines, disabled unless enabled profile is given
+        self.profile = kwargs.get('profile') or LineProfile()
+        # state of bot is saved to checkpoint log every checkpoint_lines lines, see checkpoint.py
+        self.checkpoints = kwargs.get('checkpoints')
+        self.checkpoint_lines = kwargs.get('checkpoint_lines', HeadlessControler.CHECKPOINT_LINES)
+        self._next_checkpoint = 0
+        #
+        self.script_running = False
+        self.cmds_in_flight = 0
+        self.program_line = 0
+        self.program_text_iter = None
+        self.program_lines = []
+        self.ticks = 0
+        # results of commands: (line number, command text, result)
+        self.results = []
+        # errors raised by commands: (line number, command text, error text)
+        self.errors = []
+
+    def register_action(self, name, action):
+        if not name.upper() in HeadlessControler.ACTIONS:
+            raise Exception('invalid action name "{}". must be one of {}'.format(name, HeadlessControler.ACTIONS))
+        self._actions[name.upper()] = action
+
+    def unregister_action(self, name):
+        if name.upper() in self._actions:
+            del(self._actions[name.upper()])
+
+    def raise_action(self, name, *args):
+        if name in self._actions:
+            self._actions[name](*args)
+
+    def get_tick_interval(self):
+        return self.tick_interval
+
+    def load_program(self, text):
+        self.program_lines = text.split('\n')
+        self.program_text_iter = iter(self.program_lines)
+        self.program_line = 0
+        self._next_checkpoint = self.checkpoint_lines
+        self.profile.reset()
+        self.script_running = True
+
+    def load_file(self, program):
+        """ load ProgramFile, lines are read from the file as commands are sent """
+        self.program_lines = program
+        self.program_text_iter = program.iter_from(1)
+        self.program_line = 0
+        self._next_checkpoint = self.checkpoint_lines
+        self.profile.reset()
+        self.script_running = True
+
+    def seek(self, line, checkpoint = None):
+        """ continue loaded program from line (1 based), bot is moved to its state before the line """
+        self.raise_action('SEEK', self.program_lines, line, checkpoint)
+        self.program_text_iter = iter(self.program_lines[line - 1:]) if isinstance(self.program_lines, list) else self.program_lines.iter_from(line)
+        self.program_line = line - 1
+        self._next_checkpoint = line - 1 + self.checkpoint_lines
+        self.script_running = True
+
+    def pause(self, requested = None):
+        """ suspend stepping before the next tick, requested is perf_counter() time of the request """
+        self.raise_action('PAUSE', requested)
+
+    def resume(self):
+        self.raise_action('RESUME')
+
+    def abort(self, requested = None):
+        """ stop program at the current step, commands sent ahead and queued moves are dropped """
+        self.script_running = False
+        self.program_text_iter = None
+        self.dispatcher.discard('go_coordinates')
+        self.raise_action('ABORT', requested)
+
+    def jog(self, x, y, callback = None, requested = None):
+        """ stop program and move to x, y with pen up """
+        self.abort(requested)
+        self.raise_action('JOG', x, y, callback, requested)
+
+    def next_cmd(self):
+        self.program_line += 1
+        try:
+            text = next(self.program_text_iter)
+        except StopIteration as e:
+            self.program_line = 0
+            self.script_running = False
+            return
+        if text.strip():
+            try:
+                self.raise_action('RUN_CMD', text, partial(self.on_cmd_done, self.program_line, text), self.program_line)
+            except Exception as e:
+                self.errors.append((self.program_line, text, str(e)))
+            else:
+                self.cmds_in_flight += 1
+
+    def tick(self):
+        # commands are sent ahead, bot plans them while the running one is stepping
+        while self.script_running and self.cmds_in_flight < self.lookahead:
+            self.next_cmd()
+        self.raise_action('TICK')
+        if self.metrics.enabled:
+            self.metrics.gauge('queue_depth', self.dispatcher.queue_size())
+        self.dispatcher.dispatch()
+        self.ticks += 1
+
+    def run(self, max_ticks = None):
+        """ tick until program is done, returns number of ticks """
+        while self.script_running or self.cmds_in_flight:
+            if max_ticks is not None and self.ticks >= max_ticks:
+                raise Exception('program is not finished after {} ticks'.format(max_ticks))
+            self.tick()
+        return self.ticks
+
+    def on_cmd_done(self, line, text, result):
+        # result is None for commands dropped by abort
+        self.results.append((line, text, result))
+        self.cmds_in_flight -= 1
+        if self.checkpoints is not None and result is not None and line >= self._next_checkpoint:
+            self._next_checkpoint = line + self.checkpoint_lines
+            self.raise_action('CHECKPOINT', line, self.checkpoints.append)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# cost of every line of a G-code program: planning time, segments, microsteps of both pulleys,
+# simulated time from ticks and feed time from segment feeds limited by speed of pulleys.
+# bot attributes costs to the program line controler passed with RUN_CMD (program_line),
+# planning when the command is planned and steps when its segments start, so disabled
+# profile costs one attribute lookup per command and segment.
+# commands without program line, like jogs, are not attributed.
+#
+# usage: line_profile.py <program.gcode> [--top N] [--sort ticks] [--annotate out.txt] [--json out.json]
+
+import sys
+import json
+import argparse
+
+# costs reports can be sorted by
+KEYS = ('ticks', 'sim_s', 'feed_s', 'steps', 'segments', 'plan_s')
+
+class LineCost:
+    __slots__ = ('commands', 'plan_s', 'segments', 'steps_a', 'steps_b', 'ticks', 'sim_s', 'feed_s')
+
+    def __init__(self):
+        self.commands = 0
+        self.plan_s = 0.0
+        self.segments = 0
+        self.steps_a = 0
+        self.steps_b = 0
+        self.ticks = 0
+        self.sim_s = 0.0
+        self.feed_s = 0.0
+
+    @property
+    def steps(self):
+        return self.steps_a + self.steps_b
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in LineCost.__slots__}
+
+class LineProfile:
+    def __init__(self, enabled = False):
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self):
+        # line number: LineCost
+        self.lines = {}
+
+    def _cost(self, line):
+        cost = self.lines.get(line)
+        if cost is None:
+            cost = self.lines[line] = LineCost()
+        return cost
+
+    def plan(self, line, seconds, segments, feed_s):
+        """ command of line was planned in seconds into segments taking feed_s at their feeds """
+        if line is None:
+            return
+        cost = self._cost(line)
+        cost.commands += 1
+        cost.plan_s += seconds
+        cost.segments += segments
+        cost.feed_s += feed_s
+
+    def segment(self, line, steps_a, steps_b, ticks, sim_s):
+        """ segment of command of line started with steps of pulleys, it takes ticks of sim_s seconds """
+        if line is None:
+            return
+        cost = self._cost(line)
+        cost.steps_a += steps_a
+        cost.steps_b += steps_b
+        cost.ticks += ticks
+        cost.sim_s += sim_s
+
+    def total(self):
+        total = LineCost()
+        for cost in self.lines.values():
+            for name in LineCost.__slots__:
+                setattr(total, name, getattr(total, name) + getattr(cost, name))
+        return total
+
+    def hot_lines(self, key = 'ticks', top = None):
+        """ (line, LineCost) sorted by key from the most costly, top ones only when top is given """
+        if key not in KEYS:
+            raise ValueError('invalid sort key "{}". must be one of {}'.format(key, KEYS))
+        rows = sorted(self.lines.items(), key = lambda item: (-getattr(item[1], key), item[0]))
+        return rows[:top] if top is not None else rows
+
+    def report_lines(self, program_lines = None, key = 'ticks', top = 20):
+        """ text lines of hot line report, with text of lines when program lines are given """
+        total = self.total()
+        lines = ['{:>7} {:>9} {:>6} {:>9} {:>9} {:>9} {:>9}  {}'.format(
+            'line', 'ticks', '%', 'sim s', 'feed s', 'steps', 'plan us', 'command')]
+        for line, cost in self.hot_lines(key, top):
+            share = getattr(cost, key) / getattr(total, key) * 100 if getattr(total, key) else 0.0
+            text = program_lines[line - 1].strip() if program_lines and 0 < line <= len(program_lines) else ''
+            lines.append('{:>7} {:>9} {:>6.2f} {:>9.2f} {:>9.2f} {:>9} {:>9.1f}  {}'.format(
+                line, cost.ticks, share, cost.sim_s, cost.feed_s, cost.steps, cost.plan_s * 1e6, text))
+        lines.append('{:>7} {:>9} {:>6} {:>9.2f} {:>9.2f} {:>9} {:>9.1f}  lines={} sorted by {}'.format(
+            'total', total.ticks, '', total.sim_s, total.feed_s, total.steps, total.plan_s * 1e6, len(self.lines), key))
+        return lines
+
+    def annotate(self, program_lines):
+        """ program lines prefixed with their costs, lines without cost are prefixed with blanks """
+        blank = ' ' * 39
+        result = []
+        for line, text in enumerate(program_lines, 1):
+            cost = self.lines.get(line)
+            if cost is None:
+                result.append('{} | {}'.format(blank, text))
+            else:
+                result.append('{:>8} {:>9.2f} {:>9} {:>10.1f} | {}'.format(cost.ticks, cost.sim_s, cost.steps, cost.plan_s * 1e6, text))
+        return result
+
+    def snapshot(self):
+        return {str(line): cost.as_dict() for line, cost in sorted(self.lines.items())}
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            f.write(json.dumps(self.snapshot(), indent = 2))
+
+def main():
+    parser = argparse.ArgumentParser(description = 'cost of every line of G-code program run on headless PolarBot')
+    parser.add_argument('path')
+    parser.add_argument('--top', type = int, default = 20, help = 'number of lines in report')
+    parser.add_argument('--sort', choices = KEYS, default = 'ticks')
+    parser.add_argument('--annotate', default = None, help = 'file to write program with costs of lines to')
+    parser.add_argument('--json', default = None, help = 'file to write costs of lines to')
+    parser.add_argument('--width', type = float, default = 800)
+    parser.add_argument('--height', type = float, default = 600)
+    args = parser.parse_args()
+
+    from headless import HeadlessControler
+    from polarbot import PolarBot
+    with open(args.path) as f:
+        text = f.read()
+    profile = LineProfile(enabled = True)
+    controler = HeadlessControler(profile = profile)
+    PolarBot(controler, width = args.width, height = args.height)
+    controler.load_program(text)
+    controler.run()
+    program_lines = controler.program_lines
+    for line in profile.report_lines(program_lines, args.sort, args.top):
+        print(line)
+    if args.annotate:
+        with open(args.annotate, 'w') as f:
+            f.write('{:>8} {:>9} {:>9} {:>10} |\n'.format('ticks', 'sim s', 'steps', 'plan us'))
+            f.write('\n'.join(profile.annotate(program_lines)) + '\n')
+    if args.json:
+        profile.dump(args.json)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
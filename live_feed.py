@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# live state of running PolarBot for monitors in other processes.
+# bot publishes its state into a ring of records in shared memory when a segment ends,
+# a command starts or state is set, never per step. readers poll at their own rate and
+# read records in place.
+#
+# layout, little endian:
+#   header  magic b'PBLF', version u16, record size u16, slots u64, sequence number of last record u64
+#   slots   records: sequence number u64, time f64, angle A f64, angle B f64, tool x f64, y f64,
+#           line i64, queue depth i32, pen u8
+# record of sequence number n is in slot n % slots. writer zeroes the sequence number of slot
+# before it writes the record, so reader accepts a record only when its sequence number is
+# the same before and after reading it.
+#
+# usage: live_feed.py monitor <name> [--interval 0.5]           print state published to feed
+#        live_feed.py run <name> --program <program.gcode>     run program on headless bot publishing to feed
+
+import sys
+import struct
+import argparse
+from time import time, sleep
+from collections import namedtuple
+from multiprocessing import shared_memory, resource_tracker
+
+MAGIC = b'PBLF'
+VERSION = 1
+HEADER = struct.Struct('<4sHHQQ')
+RECORD = struct.Struct('<Qdddddqi?3x')
+SEQ = struct.Struct('<Q')
+# offset of sequence number of last record in header
+HEAD_OFFSET = 16
+SLOTS = 1024
+
+# names of feeds created by this process
+_created = set()
+
+LiveState = namedtuple('LiveState', 'seq time angleA angleB x y line queue_depth pen')
+
+class LiveFeed:
+    """ writer of live state, creates shared memory block """
+    def __init__(self, name = None, slots = SLOTS):
+        self.slots = slots
+        self._shm = shared_memory.SharedMemory(name, create = True, size = HEADER.size + slots * RECORD.size)
+        self.name = self._shm.name
+        _created.add(self.name)
+        self.seq = 0
+        HEADER.pack_into(self._shm.buf, 0, MAGIC, VERSION, RECORD.size, slots, 0)
+
+    def publish(self, angleA, angleB, x, y, line, queue_depth, pen):
+        seq = self.seq + 1
+        buf = self._shm.buf
+        offset = HEADER.size + (seq % self.slots) * RECORD.size
+        RECORD.pack_into(buf, offset, 0, time(), angleA, angleB, x, y, line, queue_depth, pen)
+        SEQ.pack_into(buf, offset, seq)
+        SEQ.pack_into(buf, HEAD_OFFSET, seq)
+        self.seq = seq
+
+    def close(self, unlink = True):
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
+            _created.discard(self.name)
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name, track = False)
+    except TypeError:
+        # before python 3.13 resource tracker would unlink the block when reader exits
+        shm = shared_memory.SharedMemory(name)
+        if name not in _created:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+class LiveFeedReader:
+    """ reader of live state published by LiveFeed of another process """
+    def __init__(self, name):
+        self._shm = _attach(name)
+        magic, version, record_size, slots, head = HEADER.unpack_from(self._shm.buf, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            self._shm.close()
+            raise ValueError('"{}" is not a live feed of version {}'.format(name, VERSION))
+        self.name = name
+        self.slots = slots
+
+    def head(self):
+        """ sequence number of last published record, 0 before the first one """
+        return SEQ.unpack_from(self._shm.buf, HEAD_OFFSET)[0]
+
+    def get(self, seq):
+        """ record of sequence number, None when it is overwritten or being written """
+        buf = self._shm.buf
+        offset = HEADER.size + (seq % self.slots) * RECORD.size
+        record = RECORD.unpack_from(buf, offset)
+        if record[0] != seq or SEQ.unpack_from(buf, offset)[0] != seq:
+            return None
+        return LiveState._make(record)
+
+    def latest(self):
+        """ last published state, None before the first one """
+        head = self.head()
+        while head:
+            state = self.get(head)
+            if state is not None:
+                return state
+            # writer is faster than reader, ring wrapped over the record
+            head = self.head()
+        return None
+
+    def read(self, since = 0):
+        """ states published after sequence number since which are still in the ring """
+        head = self.head()
+        states = []
+        for seq in range(max(since + 1, head - self.slots + 1, 1), head + 1):
+            state = self.get(seq)
+            if state is not None:
+                states.append(state)
+        return states
+
+    def close(self):
+        self._shm.close()
+
+def monitor(name, interval):
+    reader = LiveFeedReader(name)
+    seq = 0
+    try:
+        while True:
+            states = reader.read(seq)
+            if states:
+                state = states[-1]
+                print('seq={} records={} line={} queue={} pen={} x={:.2f} y={:.2f} a={:.5f} b={:.5f}'.format(
+                    state.seq, len(states), state.line, state.queue_depth, int(state.pen), state.x, state.y, state.angleA, state.angleB))
+                seq = state.seq
+            sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+
+def run(path, name):
+    from headless import HeadlessControler
+    from polarbot import PolarBot
+    feed = LiveFeed(name)
+    controler = HeadlessControler()
+    bot = PolarBot(controler, live_feed = feed)
+    with open(path) as f:
+        controler.load_program(f.read())
+    try:
+        controler.run()
+        print('commands={} ticks={} records={}'.format(len(controler.results), controler.ticks, feed.seq))
+    finally:
+        feed.close()
+
+def main():
+    parser = argparse.ArgumentParser(description = 'live state feed of PolarBot in shared memory')
+    parser.add_argument('command', choices = ('monitor', 'run'))
+    parser.add_argument('name', help = 'name of shared memory block')
+    parser.add_argument('--program', default = None, help = 'program to run on headless bot')
+    parser.add_argument('--interval', type = float, default = 0.5, help = 'seconds between reads of monitor')
+    args = parser.parse_args()
+
+    if args.command == 'monitor':
+        monitor(args.name, args.interval)
+        return 0
+    if not args.program:
+        parser.error('--program is required')
+    run(args.program, args.name)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# low overhead counters, gauges and timing histograms for hot paths.
+# hot paths check "metrics.enabled" before taking time, so disabled metrics cost one attribute lookup.
+#
+#   t = perf_counter() if metrics.enabled else None
+#   ...
+#   if t is not None:
+#       metrics.timing('stage', perf_counter() - t)
+
+import json
+from bisect import bisect_left
+from time import perf_counter
+
+class Histogram:
+    # bucket upper bounds in seconds: 1us, 2us, 4us ... ~1s
+    BOUNDS = tuple(1e-6 * 2 ** i for i in range(21))
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = [0] * (len(Histogram.BOUNDS) + 1)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        self.buckets[bisect_left(Histogram.BOUNDS, value)] += 1
+
+    def percentile(self, p):
+        """ upper bound of bucket containing p-th percentile """
+        if self.count == 0:
+            return None
+        rank = self.count * p / 100
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return Histogram.BOUNDS[i] if i < len(Histogram.BOUNDS) else self.max
+        return self.max
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else None,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p99': self.percentile(99),
+        }
+
+class Metrics:
+    def __init__(self, enabled = False):
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self):
+        self.counters = {}
+        self.gauges = {}
+        self.timings = {}
+        self.started = perf_counter()
+
+    def count(self, name, n = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        self.gauges[name] = value
+
+    def timing(self, name, seconds):
+        hist = self.timings.get(name)
+        if hist is None:
+            hist = self.timings[name] = Histogram()
+        hist.add(seconds)
+
+    def rate(self, name):
+        """ counter value per second since reset """
+        elapsed = perf_counter() - self.started
+        return self.counters.get(name, 0) / elapsed if elapsed > 0 else 0.0
+
+    def snapshot(self):
+        return {
+            'enabled': self.enabled,
+            'elapsed': perf_counter() - self.started,
+            'counters': dict(self.counters),
+            'rates': {name: self.rate(name) for name in self.counters},
+            'gauges': dict(self.gauges),
+            'timings': {name: hist.as_dict() for name, hist in self.timings.items()},
+        }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.snapshot(), **kwargs)
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            f.write(self.to_json(indent = 2))
+
+    def summary_lines(self):
+        """ short text lines for stats overlay """
+        lines = []
+        for name in sorted(self.counters):
+            lines.append('{}={} ({:.0f}/s)'.format(name, self.counters[name], self.rate(name)))
+        for name in sorted(self.gauges):
+            lines.append('{}={}'.format(name, self.gauges[name]))
+        for name in sorted(self.timings):
+            hist = self.timings[name]
+            lines.append('{} n={} mean={:.1f}us max={:.1f}us'.format(name, hist.count, hist.total / hist.count * 1e6, hist.max * 1e6))
+        return lines
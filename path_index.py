@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# spatial index of recorded tool path for viewers with zoom and pan.
+# pen down polylines are cut into chunks of up to CHUNK_POINTS points, chunks are
+# registered in a uniform grid of tiles by their bounding box, so only chunks
+# intersecting the visible area are materialized. every chunk keeps simplified
+# copies of its points (Douglas-Peucker) per level of detail.
+
+from array import array
+from math import floor, log2
+
+def simplify(points, tolerance):
+    """ Douglas-Peucker simplification of flat [x0, y0, x1, y1, ...] polyline """
+    n = len(points) // 2
+    if n <= 2 or tolerance <= 0:
+        return array('d', points)
+    keep = bytearray(n)
+    keep[0] = keep[n - 1] = 1
+    sqr_tolerance = tolerance ** 2
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        x0, y0 = points[2 * first], points[2 * first + 1]
+        x1, y1 = points[2 * last], points[2 * last + 1]
+        dx, dy = x1 - x0, y1 - y0
+        sqr_len = dx * dx + dy * dy
+        max_dist, index = -1.0, first
+        for i in range(first + 1, last):
+            px, py = points[2 * i] - x0, points[2 * i + 1] - y0
+            if sqr_len:
+                # squared distance to line through first and last points
+                cross = px * dy - py * dx
+                dist = cross * cross / sqr_len
+            else:
+                dist = px * px + py * py
+            if dist > max_dist:
+                max_dist, index = dist, i
+        if max_dist > sqr_tolerance:
+            keep[index] = 1
+            stack.append((first, index))
+            stack.append((index, last))
+    result = array('d')
+    for i in range(n):
+        if keep[i]:
+            result.append(points[2 * i])
+            result.append(points[2 * i + 1])
+    return result
+
+class PathChunk:
+    __slots__ = ('points', 'bbox', 'sealed', '_lod')
+
+    def __init__(self):
+        self.points = array('d')
+        self.bbox = None
+        # sealed chunk does not change any more
+        self.sealed = False
+        self._lod = {}
+
+    def add(self, x, y):
+        self.points.append(x)
+        self.points.append(y)
+        if self.bbox is None:
+            self.bbox = [x, y, x, y]
+        else:
+            bbox = self.bbox
+            if x < bbox[0]:
+                bbox[0] = x
+            elif x > bbox[2]:
+                bbox[2] = x
+            if y < bbox[1]:
+                bbox[1] = y
+            elif y > bbox[3]:
+                bbox[3] = y
+
+    def __len__(self):
+        return len(self.points) // 2
+
+    def simplified(self, level):
+        """ points simplified with tolerance 2 ** level, cached per level of sealed chunk """
+        if level is None or not self.sealed:
+            return self.points
+        points = self._lod.get(level)
+        if points is None:
+            points = self._lod[level] = simplify(self.points, 2.0 ** level)
+        return points
+
+class PathIndex:
+    CHUNK_POINTS = 256
+    TILE_SIZE = 25.0
+    # points closer than this to previous point are not stored
+    MIN_POINT_DIST = 0.01
+
+    def __init__(self, tile_size = TILE_SIZE):
+        self.tile_size = tile_size
+        self.clear()
+
+    def clear(self):
+        self.chunks = []
+        self.tiles = {}
+        self.points = 0
+        # bounding box of all sealed chunks
+        self.bounds = None
+        self._open = None
+
+    def begin(self, x, y):
+        """ start new polyline """
+        self.end()
+        self._open = PathChunk()
+        self._open.add(x, y)
+
+    def add_point(self, x, y):
+        chunk = self._open
+        if chunk is None:
+            return
+        points = chunk.points
+        if abs(points[-2] - x) < PathIndex.MIN_POINT_DIST and abs(points[-1] - y) < PathIndex.MIN_POINT_DIST:
+            return
+        chunk.add(x, y)
+        self.points += 1
+        if len(chunk) >= PathIndex.CHUNK_POINTS:
+            # next chunk starts at the last point so polyline stays connected
+            self._seal()
+            self._open = PathChunk()
+            self._open.add(x, y)
+
+    def end(self):
+        """ finish current polyline """
+        if self._open is not None and len(self._open) > 1:
+            self._seal()
+        self._open = None
+
+    @property
+    def open_chunk(self):
+        """ chunk of current polyline being added to, None when it has less than two points """
+        if self._open is not None and len(self._open) > 1:
+            return self._open
+        return None
+
+    def _seal(self):
+        chunk = self._open
+        chunk.sealed = True
+        id = len(self.chunks)
+        self.chunks.append(chunk)
+        if self.bounds is None:
+            self.bounds = list(chunk.bbox)
+        else:
+            self.bounds = [min(self.bounds[0], chunk.bbox[0]), min(self.bounds[1], chunk.bbox[1]),
+                           max(self.bounds[2], chunk.bbox[2]), max(self.bounds[3], chunk.bbox[3])]
+        for tile in self._tiles_of(chunk.bbox):
+            self.tiles.setdefault(tile, []).append(id)
+
+    def _tiles_of(self, bbox):
+        size = self.tile_size
+        tx0, ty0 = floor(bbox[0] / size), floor(bbox[1] / size)
+        tx1, ty1 = floor(bbox[2] / size), floor(bbox[3] / size)
+        for tx in range(tx0, tx1 + 1):
+            for ty in range(ty0, ty1 + 1):
+                yield (tx, ty)
+
+    def query(self, xmin, ymin, xmax, ymax):
+        """ chunks intersecting rectangle, including the open one """
+        ids = set()
+        if self.bounds is not None:
+            # only tiles which may contain chunks are looked up
+            area = (max(xmin, self.bounds[0]), max(ymin, self.bounds[1]), min(xmax, self.bounds[2]), min(ymax, self.bounds[3]))
+            if area[0] <= area[2] and area[1] <= area[3]:
+                for tile in self._tiles_of(area):
+                    ids.update(self.tiles.get(tile, ()))
+        result = []
+        for id in sorted(ids):
+            bbox = self.chunks[id].bbox
+            if bbox[0] <= xmax and bbox[2] >= xmin and bbox[1] <= ymax and bbox[3] >= ymin:
+                result.append(self.chunks[id])
+        if self.open_chunk is not None:
+            result.append(self._open)
+        return result
+
+    @staticmethod
+    def lod_level(tolerance):
+        """ level of detail for simplification tolerance in world units """
+        return floor(log2(tolerance)) if tolerance > 0 else None
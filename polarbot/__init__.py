@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+
+# PolarBot package: Tk-free core for headless workers and tools.
+# GUI classes are imported from test_canvas2 on first access, so importing the package does not load Tk.
+
+from .core import (WIDTH, HEIGHT, ACTIONS, TICK_INTERVAL, LOOKAHEAD, CHECKPOINT_LINES,
+                   Point, Command, StepperPulley, PolarBot, forward_kinematics)
+
+_GUI = ('Visualiser', 'ControlPanel')
+
+def __getattr__(name):
+    if name in _GUI:
+        import test_canvas2
+        return getattr(test_canvas2, name)
+    raise AttributeError('module "{}" has no attribute "{}"'.format(__name__, name))
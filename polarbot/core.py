@@ -0,0 +1,777 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# kinematics and planning core of PolarBot without Tk: points, commands, stepper pulleys and the bot.
+# controlers drive the bot by actions, GUI is in test_canvas2.py, headless one in headless.py.
+
+from math import sqrt, pi, sin, cos, acos, hypot
+from time import perf_counter
+from collections import deque
+from event_dispatcher import EventDispatcher
+from metrics import Metrics
+from line_profile import LineProfile
+from executor import ExecutorBinding
+
+WIDTH = 800
+HEIGHT = 600
+
+# actions controlers raise on the bot
+ACTIONS = ('TICK', 'MOVE_TO', 'RUN_CMD', 'CLEAR', 'ESTIMATE', 'SEEK', 'CHECKPOINT', 'PAUSE', 'RESUME', 'ABORT', 'JOG')
+TICK_INTERVAL = 10
+# number of commands sent to bot ahead of the running one
+LOOKAHEAD = 8
+# state of bot is saved every CHECKPOINT_LINES lines of program, see checkpoint.py
+CHECKPOINT_LINES = 1000
+
+class Point:
+    def __init__(self, x, y):
+        self.set(x, y)
+    
+    def __getattr__(self, name):
+        if name in self.__dict__:
+            return self.__dict__[name]
+        elif name.upper() == 'X':
+            return self.__dict__['_x']
+        elif name.upper() == 'Y':
+            return self.__dict__['_y']
+        elif name.upper() == 'XY':
+            return (self.__dict__['_x'], self.__dict__['_y'])
+        else:
+            raise AttributeError('property "{}" not defined'.format(name))
+            
+    def __setattr__(self, name, val):
+        if name.upper() == 'X':
+            self.__dict__['_x'] = val
+        elif name.upper() == 'Y':
+            self.__dict__['_y'] = val
+        else:
+            raise AttributeError('property "{}" not defined'.format(name))
+            
+    def __str__(self):
+        return '({},{})'.format(self._x, self._y)
+    
+    def set(self, x, y):
+        self.__dict__['_x'] = x
+        self.__dict__['_y'] = y
+ 
+    def copy(self):
+        return Point(self.x, self.y)
+        
+class Command:
+    CMD_SEP = ' ' 
+    SUPPORTED_CMD = ('G0, G1')
+    def __init__(self, **kwargs):
+        self._cmd_text = kwargs.get('cmd_text', None)
+        self._cmd = kwargs.get('cmd', None)
+        self._arg_x = kwargs.get('x', None)
+        self._arg_y = kwargs.get('y', None)
+        self._arg_speed = kwargs.get('f', None)
+        self._callback = kwargs.get('callback', None)
+        # line of program the command comes from
+        self._line = kwargs.get('line', None)
+    
+        if not self._cmd_text == None:
+            self.parse()
+            
+    def __getattr__(self, name):
+        if name in self.__dict__:
+            return self.__dict__[name]
+        elif name.upper() == 'CMD':
+            return self.__dict__['_cmd']
+        elif name.upper() == 'X':
+            return self.__dict__['_arg_x']
+        elif name.upper() == 'Y':
+            return self.__dict__['_arg_y']
+        elif name.upper() == 'P':
+            #print(self.__dict__)
+            return Point(self.__dict__['_arg_x'], self.__dict__['_arg_y'])
+        elif name.upper() == 'CALLBACK':
+            return self.__dict__['_callback']
+        elif name.upper() == 'F':
+            return self.__dict__['_arg_speed']
+        elif name.upper() == 'LINE':
+            return self.__dict__['_line']
+        else:
+            raise AttributeError('property "{}" not defined'.format(name))
+        
+    def check(self):
+        return True
+    
+    def tool_state(self):
+        return (True if self._cmd == 'G1' else False)
+        
+    def parse(self):
+        # <CMD> [X<val>] [Y<val>] [F<val>]
+        cmd_text = self._cmd_text
+        items = cmd_text.strip().upper().split(Command.CMD_SEP, 1)
+        if len(items) == 0:
+            # empty string
+            raise Exception('can not parse "{}", command is empty'.format(cmd_text))
+        elif len(items) == 1:
+            # no args
+            self._cmd = items[0].strip()
+        else:
+            self._cmd = items[0].strip()
+            # parse args
+            for item in items[1].strip().split(Command.CMD_SEP):
+                t = item.strip()
+                if t:
+                    pref = t[0]
+                    try:
+                        amount = float(t[1:])
+                    except Exception as e:
+                        raise Exception('can not parse "{}", argument "{}" is invalid'.format(cmd_text, t))
+                    if pref == 'X':
+                        self._arg_x = amount
+                    elif pref == 'Y':
+                        self._arg_y = amount
+                    elif pref == 'F':
+                        self._arg_speed = amount
+
+class StepperPulley:
+    def __init__(self, id, spr, microsteps, dispatcher = None): #, on_step_func):
+        
+        # stepper 
+        self._steps_per_revolution = spr
+        self._microsteps = microsteps
+        self._effective_steps = spr * microsteps
+        self._rads_per_step = (2 * pi) / self._effective_steps
+        # callback
+        self._id = id
+        #self._on_step = on_step_func
+        # internal
+        self._steps_to_move = 0
+        self._dir_to_move = 0
+        # events
+        self.dispatcher = dispatcher or EventDispatcher.default()
+        # step feedback must change arm angles before the bot updates executors
+        self.dispatcher.add_event('step', mode = EventDispatcher.IMMEDIATE)
+    
+    @property
+    def id(self):
+        return self._id
+
+    def get_steps(self):
+        return self._steps_to_move
+
+    def get_rads_per_step(self):
+        return self._rads_per_step
+    
+    def set_rotation(self, angle):
+        # calc steps
+        self._steps_to_move = round(abs(angle) / self._rads_per_step)
+        # calc direction
+        if angle > 0:
+            self._dir_to_move = 1
+        elif angle < 0:
+            self._dir_to_move = -1
+        else:
+            self._dir_to_move = 0
+            self._steps_to_move = 0
+        #print('set rotation id={}, s={}, d={}'.format(self._id, self._steps_to_move, self._dir_to_move))
+        return self._steps_to_move
+    
+    def step(self):
+        if self._steps_to_move == 0:
+            #print('id={} no steps to move'.format(self._id))
+            pass
+        else:
+            # make one step in direction (-1 or +1)
+            self._steps_to_move -= 1
+            #if self._on_step:
+            #    self._on_step(self._id, self._rads_per_step * self._dir_to_move)
+            # pulley itself is emitted, bots sharing the dispatcher tell their pulleys apart by identity
+            self.dispatcher.emit('step', self, self._rads_per_step * self._dir_to_move)
+            #print('id={}, s2m={}'.format(self._id, self._steps_to_move))
+        
+        return self._steps_to_move
+        
+class PolarBot:
+    DEFAULT_SPEED = 100
+    STEPS_PER_REV = 200
+    MICROSTEP = 16
+    PULLEY_DIA_MM = 10
+    MAX_SEG_LEN_MM = 5
+    # max speed of pulleys, feed of segments is lowered where a pulley would be faster
+    MAX_STEPS_PER_S = 2000
+    
+    def __init__(self, controler, **kwargs):
+        self._executor = []
+        # executors with resolved methods, in the same order as _executor
+        self._bindings = []
+        # dispatcher of controler by default, bots sharing it ignore steps of pulleys of other bots
+        self.dispatcher = kwargs.get('dispatcher') or getattr(controler, 'dispatcher', None) or EventDispatcher.default()
+        # stage counters and timings, shared with controler if it has them
+        self.metrics = kwargs.get('metrics') or getattr(controler, 'metrics', None) or Metrics()
+        # costs of program lines, see line_profile.py
+        self.profile = kwargs.get('profile') or getattr(controler, 'profile', None) or LineProfile()
+        #self._controler = controler
+        self.area_width = kwargs.get('width', 800)
+        self.area_height = kwargs.get('height', 600) 
+        self.max_steps_per_s = kwargs.get('max_steps_per_s', PolarBot.MAX_STEPS_PER_S)
+        #
+        self.mount_point = Point(self.area_width / 2, 100)
+        #
+        self.armA_len = self.area_width / 4
+        self.armB_len = self.armA_len
+        self.sqr_arm_len = self.armA_len ** 2 
+        # max tool distance
+        self.sqr_max_tool_dist = (self.armA_len + self.armB_len) ** 2
+        # angle in radians between arm A and x axis
+        self.armA_angle = pi / 2
+        self.tg_armA_angle = None
+        # angle in radians between arm B and arm A
+        self.armB_angle = 2 * pi - pi / 2
+        self.tg_armB_angle = None
+        # angles the step grid of pulleys starts from, see state_at()
+        self.origin_angles = (self.armA_angle, self.armB_angle)
+        self.tool_state = False
+        
+        # position of robot's tool (pen)
+        self.tool_position = Point(self.mount_point.x - self.armA_len, self.mount_point.y + self.armA_len)
+        # calculated tool pos
+        self.calc_tool_position = self.tool_position.copy()
+        # target tool position
+        self.tg_tool_position = self.tool_position.copy()
+        # source tool position
+        self.sc_tool_position = self.tool_position.copy()
+        #
+        self.curent_cmd = None
+        # segments of current command: (tool x, tool y, target angle A, target angle B, feed)
+        self._segments = deque()
+        # commands planned ahead: (command, segments, end position, feed),
+        # segments are None for commands which can not run and end is the reason
+        self._planned = deque()
+        # tool position and pulley angles at the end of planned commands
+        self._plan_state = None
+        # feed of planned commands in mm/min, F is modal and set by every command with coordinates
+        self._plan_feed = PolarBot.DEFAULT_SPEED
+        # feed of the last started command, saved in state of bot
+        self.feed = self._plan_feed
+        # feed of running segment, limited by speed of pulleys
+        self.segment_feed = None
+        # preflight estimate of edited program, created on first estimate
+        self._estimator = None
+        # state is published to live feed at segment ends, see live_feed.py
+        self.live_feed = kwargs.get('live_feed')
+        # program line of the last started command
+        self.current_line = None
+        # stepping is suspended, commands are kept
+        self.paused = False
+        # time of pause, abort or jog request not yet followed by a tick, see on_tick
+        self._preempt_requested = None
+        # seconds from the last preemption request to the next tick
+        self.last_preempt_latency = None
+        #
+        self.tick_int = controler.get_tick_interval()
+        # create stepper pulleys and initialize events
+        self.dispatcher.subscribe('step', self.on_stepper_step)
+        self.pulleyA = StepperPulley('A', PolarBot.STEPS_PER_REV, PolarBot.MICROSTEP, self.dispatcher) #, self.on_a_step)
+        self.pulleyB = StepperPulley('B', PolarBot.STEPS_PER_REV, PolarBot.MICROSTEP, self.dispatcher) #, self.on_b_step)
+        # register actions
+        controler.register_action('tick', self.on_tick)
+        #controler.register_action('move_to', self.on_move_to)
+        controler.register_action('run_cmd', self.on_run_cmd)
+        controler.register_action('clear', self.on_clear)
+        controler.register_action('estimate', self.on_estimate)
+        controler.register_action('seek', self.on_seek)
+        controler.register_action('checkpoint', self.on_checkpoint)
+        controler.register_action('pause', self.on_pause)
+        controler.register_action('resume', self.on_resume)
+        controler.register_action('abort', self.on_abort)
+        controler.register_action('jog', self.on_jog)
+        # events
+        self.dispatcher.subscribe('go_coordinates', self.on_move_to)
+        
+    def update(self):
+        # update executioners
+        t = perf_counter() if self.metrics.enabled else None
+        angleA, angleB = self.armA_angle, self.armB_angle
+        for binding in self._bindings:
+            try:
+                if binding.direct:
+                    binding.update(angleA, angleB)
+                else:
+                    binding.push((angleA, angleB))
+            except Exception as e:
+                print(e)
+        if t is not None:
+            self.metrics.timing('update', perf_counter() - t)
+        
+    def add_executor(self, ex, batch = None, max_rate = None):
+        # batch and max_rate override options of executor, see executor.Executor
+        try:
+            ex.init(self.area_width, self.area_height, self.mount_point, self.armA_len)
+            self._executor.append(ex)
+            self._bindings.append(ExecutorBinding(ex, batch, max_rate))
+        except Exception as e:
+            print(e)
+        self.update()
+        
+    def rem_executor(self, ex):
+        if ex in self._executor:
+            i = self._executor.index(ex)
+            self._flush_executors()
+            del(self._executor[i])
+            del(self._bindings[i])
+            
+    def load_program(self, data):
+        pass
+    
+    def _flush_executors(self):
+        # deliver updates held back by batching or rate limits
+        for binding in self._bindings:
+            try:
+                binding.flush()
+            except Exception as e:
+                print(e)
+
+    def _execute(self, action, args):
+        # pending updates go before any other action
+        self._flush_executors()
+        for binding in self._bindings:
+            method = binding.actions.get(action) or getattr(binding.executor, action, None)
+            if method is None:
+                # all methods of executor are optional
+                continue
+            try:
+                method(*args)
+            except Exception as e:
+                print(e)
+    
+    def calc_target_angles(self):
+        self.tg_armA_angle, self.tg_armB_angle = self.inverse_kinematics(self.tool_position.x, self.tool_position.y)
+
+    def inverse_kinematics(self, x, y):
+        """ arm angles (armA_angle, armB_angle) for tool position x, y """
+        # calc distance between tool position and mount point
+        dx = x - self.mount_point.x
+        dy = y - self.mount_point.y
+        sqr_tool_dist = dx ** 2 + dy ** 2
+        self.tool_dist = sqrt(sqr_tool_dist)
+        if not self.tool_dist:
+            # arms are folded, any angle of arm A puts the tool on mount point
+            raise ValueError('tool position {},{} is at mount point'.format(x, y))
+        # calc armB_angle
+        cos_beta = (self.sqr_arm_len + self.sqr_arm_len - sqr_tool_dist) / (2 * self.sqr_arm_len)
+        beta = acos(cos_beta)
+        # calc armA_angle
+        # calc other two angles in isosceles triangle
+        base_angle = (pi - beta) / 2
+        # calc straight angle of tool path line
+        alpha = acos(abs(dx) / self.tool_dist)
+        if x <= self.mount_point.x:
+            return pi - (alpha + base_angle), 2 * pi - beta
+        return alpha - base_angle, 2 * pi - beta
+            
+    def _actuate(self):
+        # start moving pulleys to target angles
+        # deltas
+        da = self.tg_armA_angle - self.armA_angle
+        db = self.tg_armB_angle - self.armB_angle
+        #
+        stepsA = self.pulleyA.set_rotation(da)
+        stepsB = self.pulleyB.set_rotation(db)
+        # set master and slave pulleys
+        self.master_pulley = self.pulleyA if stepsA >= stepsB else self.pulleyB
+        self.slave_pulley = self.pulleyA if stepsA < stepsB else self.pulleyB
+        # error
+        self.error = self.master_pulley.get_steps() / 2
+        
+    def check_bounds(self, x, y):
+        return ((x - self.mount_point.x) ** 2 + (y - self.mount_point.y) ** 2 <= self.sqr_max_tool_dist)
+    
+    def joint_rates(self, angleA, angleB, vx, vy):
+        """ speeds of arm angles A, B in rad/s for tool velocity vx, vy in mm/s at arm angles,
+            from inverse of the Jacobian of forward kinematics """
+        # tool = mount + L * (cos A - cos(A + B), sin A - sin(A + B))
+        arm_len = self.armA_len
+        sin_ab, cos_ab = sin(angleA + angleB), cos(angleA + angleB)
+        j11 = arm_len * (sin_ab - sin(angleA))
+        j12 = arm_len * sin_ab
+        j21 = arm_len * (cos(angleA) - cos_ab)
+        j22 = -arm_len * cos_ab
+        # determinant is -L^2 * sin(B), zero with arms stretched or folded
+        det = j11 * j22 - j12 * j21
+        if abs(det) < 1e-9:
+            det = 1e-9 if det >= 0 else -1e-9
+        return (j22 * vx - j12 * vy) / det, (j11 * vy - j21 * vx) / det
+
+    def feed_limit(self, angleA, angleB, dx, dy, feed):
+        """ feed in mm/min of move by dx, dy at arm angles at which neither pulley exceeds max_steps_per_s """
+        dist = hypot(dx, dy)
+        if not dist or feed <= 0:
+            return feed
+        speed = feed / 60 / dist
+        rateA, rateB = self.joint_rates(angleA, angleB, dx * speed, dy * speed)
+        steps_per_s = max(abs(rateA), abs(rateB)) / self.pulleyA.get_rads_per_step()
+        if steps_per_s <= self.max_steps_per_s:
+            return feed
+        return feed * self.max_steps_per_s / steps_per_s
+
+    def move_to(self, x, y):
+        if not self.check_bounds(x, y):
+            print('move fail: out of bounds')
+        self.tool_position.x = x
+        self.tool_position.y = y
+        self.calc_target_angles()
+        self.armA_angle, self.armB_angle = self.tg_armA_angle, self.tg_armB_angle
+        self.origin_angles = (self.armA_angle, self.armB_angle)
+        self.update()
+
+    def plan_cmd(self, cmd):
+        """ plan segments of command and put it in queue after already planned ones """
+        t = perf_counter() if self.metrics.enabled else None
+        if t is not None:
+            self.metrics.count('commands')
+        p = perf_counter() if self.profile.enabled else None
+        if cmd.x is None or cmd.y is None:
+            raise Exception('command "{}" has no X or Y'.format(cmd.cmd))
+        if self._plan_state is None or (self.curent_cmd is None and not self._planned):
+            # nothing planned, planning starts from current state
+            self._plan_state = (self.tool_position.x, self.tool_position.y, self.armA_angle, self.armB_angle)
+        if cmd.f is not None:
+            self._plan_feed = cmd.f
+        feed = self._plan_feed
+        if not self.check_bounds(*cmd.p.xy):
+            self._reject(cmd, 'out of bounds', p)
+            return
+        x, y, angleA, angleB = self._plan_state
+        dx = cmd.x - x
+        dy = cmd.y - y
+        # number of segmets
+        seg_count = 1
+        max_d = max(abs(dx), abs(dy))
+        while max_d / seg_count > PolarBot.MAX_SEG_LEN_MM:
+            seg_count += 1
+        dx /= seg_count
+        dy /= seg_count
+        rads = self.pulleyA.get_rads_per_step()
+        seg_len = hypot(dx, dy)
+        # pulley speeds are at most tool speed * sqrt(5) / (L * |sin B|), norm of the inverse Jacobian,
+        # so feed_limit only checks segments with |sin B| under min_sin, the ones near singular poses
+        min_sin = feed / 60 * sqrt(5) / (self.armA_len * rads * self.max_steps_per_s)
+        segments = deque()
+        # feed time of segments for profile, merged segments run at feed of the next one
+        feed_s = 0.0
+        merged = 0
+        for i in range(seg_count):
+            x += dx
+            y += dy
+            try:
+                if t is not None:
+                    k = perf_counter()
+                    tgA, tgB = self.inverse_kinematics(x, y)
+                    self.metrics.timing('calc_target_angles', perf_counter() - k)
+                else:
+                    tgA, tgB = self.inverse_kinematics(x, y)
+            except ValueError:
+                # path goes through mount point, plan state stays at the end of previous command
+                self._reject(cmd, 'path goes through mount point', p)
+                return
+            # pulleys move by whole steps, segments without steps are merged with the next one
+            stepsA = round((tgA - angleA) / rads)
+            stepsB = round((tgB - angleB) / rads)
+            if stepsA or stepsB:
+                # feed is checked at the end of segment, pulleys are fastest near singular poses
+                if abs(sin(tgB)) < min_sin:
+                    limit = self.feed_limit(tgA, tgB, dx, dy, feed)
+                else:
+                    limit = feed
+                if limit < feed and t is not None:
+                    self.metrics.count('limited_segments')
+                segments.append((x, y, tgA, tgB, limit))
+                angleA += stepsA * rads
+                angleB += stepsB * rads
+                if p is not None and limit > 0:
+                    feed_s += (merged + 1) * seg_len / limit * 60
+                merged = 0
+            else:
+                merged += 1
+        if t is not None:
+            self.metrics.count('segments', len(segments))
+        self._plan_state = (x, y, angleA, angleB)
+        self._planned.append((cmd, segments, (x, y), feed))
+        if t is not None:
+            self.metrics.timing('plan_cmd', perf_counter() - t)
+        if p is not None:
+            self.profile.plan(cmd.line, perf_counter() - p, len(segments), feed_s)
+
+    def _reject(self, cmd, reason, p):
+        # command which can not run is called back with False when its turn comes
+        self._planned.append((cmd, None, reason, self._plan_feed))
+        if p is not None:
+            self.profile.plan(cmd.line, perf_counter() - p, 0, 0.0)
+
+    def run_cmd(self, cmd):
+        # command starts at once when bot is idle, otherwise after planned ones
+        self.plan_cmd(cmd)
+        self._start_next()
+
+    def _start_next(self):
+        # next planned command starts in the same tick the previous one finished
+        while self.curent_cmd is None and self._planned:
+            cmd, segments, end, self.feed = self._planned.popleft()
+            if segments is None:
+                print('cmd fail: {}'.format(end))
+                if cmd.callback:
+                    cmd.callback(False)
+                continue
+            # set tool of executors
+            self.tool_state = cmd.tool_state()
+            self._execute('set_tool', (self.tool_state,))
+            self.sc_tool_position.set(*self.tool_position.xy)
+            self.tg_tool_position.set(*end)
+            self.current_line = cmd.line
+            self.publish()
+            if not segments:
+                # move is shorter than one step
+                self.tool_position.set(*end)
+                if cmd.callback:
+                    cmd.callback(True)
+                continue
+            self.curent_cmd = cmd
+            self._segments = segments
+            self._next_segment()
+
+    def _next_segment(self):
+        x, y, self.tg_armA_angle, self.tg_armB_angle, feed = self._segments.popleft()
+        self.tool_position.set(x, y)
+        if feed != self.segment_feed:
+            # executors driving hardware pace segments by feed
+            self.segment_feed = feed
+            self._execute('set_feed', (feed,))
+        self._actuate()
+        if self.profile.enabled:
+            # master pulley steps once per tick
+            stepsA, stepsB = self.pulleyA.get_steps(), self.pulleyB.get_steps()
+            ticks = max(stepsA, stepsB)
+            self.profile.segment(self.curent_cmd.line, stepsA, stepsB, ticks, ticks * self.tick_int / 1000)
+        
+    def abort(self):
+        """ stop at the current step, running and planned commands are dropped and called back with None """
+        self._flush_executors()
+        callbacks = []
+        if self.curent_cmd is not None:
+            callbacks.append(self.curent_cmd.callback)
+            # tool stops between segment ends, pulleys stay on the step grid
+            x1, y1, x, y = forward_kinematics(self.mount_point, self.armA_len, self.armB_len, self.armA_angle, self.armB_angle)
+            self.tool_position.set(x, y)
+        callbacks += [cmd.callback for cmd, segments, end, feed in self._planned]
+        self.curent_cmd = None
+        self._segments = deque()
+        self._planned.clear()
+        self._plan_state = None
+        # F of dropped commands is dropped too
+        self._plan_feed = self.feed
+        self.pulleyA.set_rotation(0)
+        self.pulleyB.set_rotation(0)
+        self.paused = False
+        if self.tool_state:
+            self.tool_state = False
+            self._execute('set_tool', (False,))
+        self.publish()
+        for callback in callbacks:
+            if callback:
+                callback(None)
+
+    def _preempted(self, requested):
+        # latency is measured up to the next tick, the first one with the new state
+        self._preempt_requested = requested if requested is not None else perf_counter()
+
+    def publish(self):
+        # state to live feed, only at segment ends and changes of command
+        if self.live_feed is not None:
+            self.live_feed.publish(self.armA_angle, self.armB_angle, self.tool_position.x, self.tool_position.y,
+                                   self.current_line or 0, len(self._planned), self.tool_state)
+
+    def get_state(self, line):
+        """ state of idle bot before line of program, see checkpoint.py """
+        return {'line': line, 'x': self.tool_position.x, 'y': self.tool_position.y,
+                'angleA': self.armA_angle, 'angleB': self.armB_angle, 'pen': self.tool_state,
+                'origin': list(self.origin_angles), 'feed': self.feed}
+
+    def state_at(self, lines, line, checkpoint = None):
+        """ state of bot before line (1 based) of program lines without running earlier lines.
+            program is expected to start at current state of bot or at checkpoint """
+        base = checkpoint or self.get_state(1)
+        originA, originB = base['origin']
+        rads = self.pulleyA.get_rads_per_step()
+        state = dict(base, line = line)
+        # checkpoints saved without feed start at default feed
+        state.setdefault('feed', PolarBot.DEFAULT_SPEED)
+        moved = fed = False
+        for i in range(min(line, len(lines) + 1) - 1, base['line'] - 1, -1):
+            text = lines[i - 1]
+            if not text.strip():
+                continue
+            try:
+                cmd = Command(cmd_text = text)
+            except Exception:
+                # bot skips commands which can not be parsed
+                continue
+            if cmd.x is None or cmd.y is None:
+                # commands without coordinates fail, their F is ignored
+                continue
+            if not fed and cmd.f is not None:
+                # the last F, every command with coordinates sets it
+                state['feed'] = cmd.f
+                fed = True
+            if not moved and self.check_bounds(cmd.x, cmd.y):
+                try:
+                    angleA, angleB = self.inverse_kinematics(cmd.x, cmd.y)
+                except ValueError:
+                    # command which ends at mount point fails
+                    continue
+                # the last command which moved the bot, pulleys end on step grid point nearest to its target
+                state.update(x = cmd.x, y = cmd.y, pen = cmd.tool_state(),
+                             angleA = originA + round((angleA - originA) / rads) * rads,
+                             angleB = originB + round((angleB - originB) / rads) * rads,
+                             origin = [originA, originB])
+                moved = True
+            if moved and fed:
+                break
+        return state
+
+    def set_state(self, state):
+        """ move idle bot to state without stepping """
+        if self.curent_cmd is not None or self._planned:
+            raise Exception('can not change state of bot while commands are running')
+        # executors see a pen up jump to the new position
+        self._execute('set_tool', (False,))
+        self.tool_position.set(state['x'], state['y'])
+        self.armA_angle, self.armB_angle = state['angleA'], state['angleB']
+        self.origin_angles = tuple(state['origin'])
+        self._plan_state = None
+        # executors pace the next segments by feed of state until a segment changes it
+        self.feed = self._plan_feed = state.get('feed', PolarBot.DEFAULT_SPEED)
+        self.segment_feed = self.feed
+        self._execute('set_feed', (self.feed,))
+        self.update()
+        self.tool_state = state['pen']
+        self._execute('set_tool', (self.tool_state,))
+        # line of state is the next one to run
+        self.current_line = state['line'] - 1
+        self.publish()
+
+    # EVENTS
+    def on_stepper_step(self, pulley, angle):
+        if pulley is self.pulleyA:
+            self.armA_angle += angle
+        elif pulley is self.pulleyB:
+            self.armB_angle += angle
+        else:
+            # pulley of another bot on the same dispatcher
+            return
+        if self.metrics.enabled:
+            self.metrics.count('steps')
+        
+    # def on_a_step(self, id, angle):
+        # self.armA_angle += angle
+        # #self.update()
+        
+    # def on_b_step(self, id, angle):
+        # self.armB_angle += angle
+        # #self.update()
+        
+    def on_tick(self):
+        if self._preempt_requested is not None:
+            self.last_preempt_latency = perf_counter() - self._preempt_requested
+            self._preempt_requested = None
+            if self.metrics.enabled:
+                self.metrics.timing('preempt_latency', self.last_preempt_latency)
+        if self.curent_cmd and not self.paused:
+            # step master pulley
+            rem_master_steps = self.master_pulley.step()
+            self.error -= self.slave_pulley.get_steps()
+            if self.error < 0:
+                rem_slave_steps = self.slave_pulley.step()
+                self.error += self.master_pulley.get_steps()
+            self.update()
+            if rem_master_steps == 0:
+                self._flush_executors()
+                self.publish()
+                if self._segments:
+                    self._next_segment()
+                else:
+                    # all done
+                    self.tool_position.set(*self.tg_tool_position.xy)
+                    cb = self.curent_cmd.callback
+                    self.curent_cmd = None
+                    if cb:
+                        cb(True)
+                    self._start_next()
+            
+    def on_move_to(self, x, y, callback):
+        #print('move_to({},{})'.format(x, y))
+        self.run_cmd(Command(cmd = 'G1', x = x, y = y, callback = callback))
+        #self.move_to(x, y)
+    
+    def on_run_cmd(self, text, callback, line = None):
+        #print('run_cmd({})'.format(text))
+        self.run_cmd(Command(cmd_text = text, callback = callback, line = line))
+    
+    def on_pause(self, requested = None):
+        # requested is perf_counter() time of user input
+        self.paused = True
+        self._flush_executors()
+        self._preempted(requested)
+
+    def on_resume(self):
+        self.paused = False
+
+    def on_abort(self, requested = None):
+        self.abort()
+        self._preempted(requested)
+
+    def on_jog(self, x, y, callback, requested = None):
+        # pen up move to x, y replaces running and planned commands
+        self.abort()
+        self.run_cmd(Command(cmd = 'G0', x = x, y = y, callback = callback))
+        self._preempted(requested)
+
+    def on_clear(self):
+        self._execute('clear', ())
+        self._execute('update', (self.armA_angle, self.armB_angle, True))
+
+    def on_seek(self, lines, line, checkpoint = None):
+        self.set_state(self.state_at(lines, line, checkpoint))
+
+    def on_checkpoint(self, line, callback):
+        # called by controler when command of line is done
+        callback(self.get_state(line + 1))
+
+    @property
+    def estimator(self):
+        """ preflight estimate of edited program, only changed lines are planned again """
+        if self._estimator is None:
+            from preflight import IncrementalEstimator
+            self._estimator = IncrementalEstimator(self)
+        return self._estimator
+
+    def on_estimate(self, program, callback):
+        # preflight estimate of program run from current pose. text is estimated incrementally,
+        # lines of program_file.ProgramFile in one pass without a copy of the whole text
+        if isinstance(program, str):
+            callback(self.estimator.update(program))
+        else:
+            from preflight import estimate, parse_program
+            callback(estimate(parse_program(program), self))
+    
+def forward_kinematics(mount_point, armA_len, armB_len, angleA, angleB):
+    """ returns point of junction of arms and tool position (x1, y1, tool_x, tool_y) for arm angles """
+    signa = 1 if angleA >= 0 else -1
+    # calc point of junction armA and armB
+    dx1 = armA_len * cos(angleA)
+    dy1 = sqrt(armA_len ** 2 - dx1 ** 2) * signa
+    x1 = mount_point.x + dx1
+    y1 = mount_point.y + dy1
+    # calc tool position
+    if angleA >=0:
+        beta = pi - (2 * pi - angleB) - (pi - abs(angleA) - pi / 2)
+    else:
+        beta = pi - (2 * pi - angleB) - abs(angleA) - pi / 2
+    signbeta = 1 if beta >= 0 else -1
+    dy2 = armB_len * cos(beta)
+    dx2 = sqrt(armB_len ** 2 - dy2 ** 2)
+    return (x1, y1, x1 - (dx2 * signbeta), y1 + dy2)
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+# Tk-free state of the visualiser: view transform, incremental forward kinematics of arms
+# and recorded tool path. Visualiser in test_canvas2.py draws it on a Tk canvas,
+# benchmarks use it without a display.
+
+from math import pi, sin, cos
+from path_index import PathIndex
+from .core import Point, PolarBot
+
+class ViewState:
+    # incremental updates of arm directions between exact forward kinematics
+    RESYNC_UPDATES = 256
+    # world distance between recorded points of tool path, under the tool move of one microstep,
+    # so the path keeps its detail at any zoom, also when it was drawn zoomed out
+    PATH_STEP = 0.1
+
+    def __init__(self, width, height, rads_per_step = None):
+        self.width = width
+        self.height = height
+        self.bot_width = width
+        self.bot_height = height
+        self.x_scale = 1.0
+        self.y_scale = 1.0
+        # screen position of tool at the last update it moved
+        self._last_tool_p = Point(0.0, 0.0)
+        self._enable_tool = False
+        # view: world coordinates of top left corner and zoom
+        self.zoom = 1.0
+        self.view_x = 0.0
+        self.view_y = 0.0
+        # recorded tool path, only visible part is materialized as canvas items
+        self.path_index = PathIndex()
+        # world position of the last recorded point of tool path
+        self._path_p = Point(0.0, 0.0)
+        # tool x, y, arm junction x, y and arm angles of the last update
+        self._pose = None
+        # forward kinematics: arms are rotated by the step angle of pulleys between resyncs
+        self.rads_per_step = rads_per_step or 2 * pi / (PolarBot.STEPS_PER_REV * PolarBot.MICROSTEP)
+        self._step_cos = cos(self.rads_per_step)
+        self._step_sin = sin(self.rads_per_step)
+        self._fk = None
+        self._fk_updates = 0
+
+    def set_geometry(self, width, height, mount_point, arm_len):
+        """ area and arms of bot, see Executor.init """
+        self.bot_width = width
+        self.bot_height = height
+        self.bot_mount_point = mount_point
+        # distance
+        self.bot_armA_len = arm_len
+        self.bot_armB_len = arm_len
+        self._fk = None
+        # scale
+        self.x_scale = self.width / self.bot_width
+        self.y_scale = self.height / self.bot_height
+
+    def scale_x(self, v):
+        return round((v - self.view_x) * self.x_scale * self.zoom)
+
+    def scale_y(self, v):
+        return round((v - self.view_y) * self.y_scale * self.zoom)
+
+    def world_x(self, x):
+        return x / (self.x_scale * self.zoom) + self.view_x
+
+    def world_y(self, y):
+        return y / (self.y_scale * self.zoom) + self.view_y
+
+    def visible_area(self):
+        """ world coordinates of visible rectangle (xmin, ymin, xmax, ymax) """
+        return (self.view_x, self.view_y, self.world_x(self.width), self.world_y(self.height))
+
+    def _forward_kinematics(self, angleA, angleB):
+        # same result as forward_kinematics(): arm A points in direction angleA and arm B in angleA + angleB + pi,
+        # unit vectors of both directions are rotated when angles changed by one step
+        fk = self._fk
+        if fk is not None and self._fk_updates < ViewState.RESYNC_UPDATES:
+            lastA, lastB, ax, ay, bx, by = fk
+            rads = self.rads_per_step
+            stepsA = round((angleA - lastA) / rads)
+            stepsB = round((angleB - lastB) / rads)
+            stepsAB = stepsA + stepsB
+            if -1 <= stepsA <= 1 and -1 <= stepsAB <= 1 \
+                    and abs(angleA - lastA - stepsA * rads) < 1e-9 and abs(angleB - lastB - stepsB * rads) < 1e-9:
+                c = self._step_cos
+                if stepsA:
+                    s = self._step_sin * stepsA
+                    ax, ay = ax * c - ay * s, ax * s + ay * c
+                if stepsAB:
+                    s = self._step_sin * stepsAB
+                    bx, by = bx * c - by * s, bx * s + by * c
+                self._fk_updates += 1
+            else:
+                fk = None
+        else:
+            fk = None
+        if fk is None:
+            # exact resync
+            ax, ay = cos(angleA), sin(angleA)
+            bx, by = cos(angleA + angleB), sin(angleA + angleB)
+            self._fk_updates = 0
+        self._fk = (angleA, angleB, ax, ay, bx, by)
+        x1 = self.bot_mount_point.x + self.bot_armA_len * ax
+        y1 = self.bot_mount_point.y + self.bot_armA_len * ay
+        return x1, y1, x1 - self.bot_armB_len * bx, y1 - self.bot_armB_len * by
+
+    def update_pose(self, angleA, angleB, force = False):
+        """ pose of arm angles, returns (x1, y1) of arm junction, (tool x, tool y) on screen and
+            whether tool moved on screen or force is set. tool path gets a point when the tool is down
+            and it moved by PATH_STEP in world, independently of zoom """
+        x1, y1, f_tx, f_ty = self._forward_kinematics(angleA, angleB)
+        tool_x = self.scale_x(f_tx)
+        tool_y = self.scale_y(f_ty)
+        self._pose = (f_tx, f_ty, x1, y1, angleA, angleB)
+        if self._enable_tool:
+            path_p = self._path_p
+            if abs(f_tx - path_p.x) >= ViewState.PATH_STEP or abs(f_ty - path_p.y) >= ViewState.PATH_STEP:
+                self.path_index.add_point(f_tx, f_ty)
+                path_p.set(f_tx, f_ty)
+        moved = tool_x != self._last_tool_p.x or tool_y != self._last_tool_p.y or force
+        if moved:
+            self._last_tool_p.set(tool_x, tool_y)
+        return x1, y1, tool_x, tool_y, moved
+
+    def set_tool(self, state = True):
+        if state and not self._enable_tool and self._pose is not None:
+            # tool path continues from current tool position
+            self.path_index.begin(self._pose[0], self._pose[1])
+            self._path_p.set(self._pose[0], self._pose[1])
+        elif not state:
+            self.path_index.end()
+        self._enable_tool = state
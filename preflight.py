@@ -0,0 +1,562 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# preflight estimate of a G-code program without running it: microsteps of both pulleys,
+# segments, pen down and travel distance and machine time, from geometry and pose of PolarBot.
+# program is parsed into columns, then segments of all commands are planned in one pass,
+# with numpy arrays when numpy is installed.
+# segments and steps are planned the same way as PolarBot.plan_cmd does it,
+# slave pulley steps lost by on_tick interpolation are not modelled, so counts are estimates.
+# IncrementalEstimator keeps plan of every line for programs edited between estimates.
+# speed_limits() reports regions where feed is lowered so that no pulley exceeds its max speed.
+#
+# usage: preflight.py <program.gcode> [--tick-interval N] [--width W] [--height H] [--max-steps-per-s N] [--limits]
+
+import sys
+import argparse
+from array import array
+from math import sqrt, pi, acos, ceil
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# feedrate in mm/min used until program sets F
+DEFAULT_FEED = 100.0
+
+class Program:
+    """ commands of program text as columns """
+    def __init__(self):
+        # line number, target x, y, pen state and feedrate of every command with coordinates
+        self.lines = array('l')
+        self.x = array('d')
+        self.y = array('d')
+        self.pen = array('b')
+        self.feed = array('d')
+        # number of lines, including empty ones
+        self.line_count = 0
+        # (line number, error text) of commands which can not run
+        self.errors = []
+
+    def __len__(self):
+        return len(self.lines)
+
+def parse_line(line, feed):
+    """ (x, y, pen, feed) of upper case program line, None for empty line, error text for invalid one """
+    items = line.split()
+    if not items:
+        return None
+    x = y = None
+    for item in items[1:]:
+        pref = item[0]
+        try:
+            amount = float(item[1:])
+        except ValueError:
+            return 'can not parse "{}", argument "{}" is invalid'.format(line.strip(), item)
+        if pref == 'X':
+            x = amount
+        elif pref == 'Y':
+            y = amount
+        elif pref == 'F':
+            feed = amount
+    if x is None or y is None:
+        return 'command "{}" has no X or Y'.format(line.strip())
+    return x, y, items[0] == 'G1', feed
+
+def parse_program(text, feed = DEFAULT_FEED):
+    """ parse program text the way Command.parse does it, F is modal.
+        text may also be a sequence of lines like program_file.ProgramFile, read line by line """
+    program = Program()
+    errors = program.errors
+    add_line, add_x, add_y = program.lines.append, program.x.append, program.y.append
+    add_pen, add_feed = program.pen.append, program.feed.append
+    number = 0
+    lines = text.upper().split('\n') if isinstance(text, str) else (line.upper() for line in text)
+    for number, line in enumerate(lines, 1):
+        items = line.split()
+        if not items:
+            continue
+        if len(items) == 3 and items[1][0] == 'X' and items[2][0] == 'Y':
+            # common "G1 X.. Y.." form
+            try:
+                x, y = float(items[1][1:]), float(items[2][1:])
+            except ValueError:
+                pass
+            else:
+                add_line(number)
+                add_x(x)
+                add_y(y)
+                add_pen(items[0] == 'G1')
+                add_feed(feed)
+                continue
+        parsed = parse_line(line, feed)
+        if isinstance(parsed, str):
+            errors.append((number, parsed))
+            continue
+        x, y, pen, feed = parsed
+        add_line(number)
+        add_x(x)
+        add_y(y)
+        add_pen(pen)
+        add_feed(feed)
+    program.line_count = number
+    return program
+
+class Geometry:
+    """ arm geometry and pose of bot the estimate starts from """
+    def __init__(self, bot):
+        self.mount_x = bot.mount_point.x
+        self.mount_y = bot.mount_point.y
+        self.arm_len = bot.armA_len
+        self.sqr_arm_len = bot.armA_len ** 2
+        self.sqr_max_tool_dist = bot.sqr_max_tool_dist
+        self.rads_per_step = bot.pulleyA.get_rads_per_step()
+        self.max_seg_len = bot.MAX_SEG_LEN_MM
+        self.tick_interval = bot.tick_int
+        self.start_angles = (bot.armA_angle, bot.armB_angle)
+        self.start_position = bot.tool_position.xy
+
+def _segments(dx, dy, max_seg_len):
+    # number of segments of PolarBot.plan_cmd
+    max_d = max(abs(dx), abs(dy))
+    count = max(1, ceil(max_d / max_seg_len))
+    if count > 1 and max_d / (count - 1) <= max_seg_len:
+        count -= 1
+    return count
+
+def _plan_move(geometry, tool_x, tool_y, posA, posB, x, y, out = None):
+    """ plan move of tool from tool_x, tool_y at pulley positions posA, posB to x, y,
+        returns (posA, posB, segments, steps A, steps B, ticks).
+        signed steps of segments are appended to out pair of arrays when given """
+    mount_x, mount_y = geometry.mount_x, geometry.mount_y
+    sqr_arm_len = geometry.sqr_arm_len
+    rads = geometry.rads_per_step
+    startA, startB = geometry.start_angles
+    dx, dy = x - tool_x, y - tool_y
+    count = _segments(dx, dy, geometry.max_seg_len)
+    seg_dx, seg_dy = dx / count, dy / count
+    segments = steps_a = steps_b = ticks = 0
+    for k in range(count):
+        tool_x += seg_dx
+        tool_y += seg_dy
+        # PolarBot.calc_target_angles
+        tx, ty = tool_x - mount_x, tool_y - mount_y
+        sqr_dist = tx * tx + ty * ty
+        dist = sqrt(sqr_dist)
+        beta = acos(max(-1.0, min(1.0, (2 * sqr_arm_len - sqr_dist) / (2 * sqr_arm_len))))
+        base_angle = (pi - beta) / 2
+        alpha = acos(abs(tx) / dist) if dist else 0.0
+        angleA = pi - (alpha + base_angle) if tx <= 0 else alpha - base_angle
+        # pulleys move by whole steps, positions stay on the step grid of start angles
+        a = round((angleA - startA) / rads)
+        b = round((2 * pi - beta - startB) / rads)
+        da = abs(a - posA)
+        db = abs(b - posB)
+        steps_a += da
+        steps_b += db
+        # master pulley makes one step per tick, segments without steps are merged by planner
+        if da or db:
+            segments += 1
+            ticks += max(da, db)
+            if out is not None:
+                out[0].append(a - posA)
+                out[1].append(b - posB)
+        posA, posB = a, b
+    return posA, posB, segments, steps_a, steps_b, ticks
+
+def _plan_python(program, geometry):
+    mount_x, mount_y = geometry.mount_x, geometry.mount_y
+    sqr_max_tool_dist = geometry.sqr_max_tool_dist
+    lines, xs, ys, pens, feeds = program.lines, program.x, program.y, program.pen, program.feed
+    tool_x, tool_y = geometry.start_position
+    posA = posB = 0
+    segments = steps_a = steps_b = ticks = 0
+    pen_down = travel = feed_time = 0.0
+    out_of_bounds = []
+    for i in range(len(program)):
+        x, y = xs[i], ys[i]
+        if (x - mount_x) ** 2 + (y - mount_y) ** 2 > sqr_max_tool_dist:
+            # command is skipped by bot, the tool stays in place
+            out_of_bounds.append(lines[i])
+            continue
+        dist = sqrt((x - tool_x) ** 2 + (y - tool_y) ** 2)
+        if pens[i]:
+            pen_down += dist
+        else:
+            travel += dist
+        if feeds[i] > 0:
+            feed_time += dist / feeds[i] * 60
+        posA, posB, n, a, b, t = _plan_move(geometry, tool_x, tool_y, posA, posB, x, y)
+        segments += n
+        steps_a += a
+        steps_b += b
+        ticks += t
+        tool_x, tool_y = x, y
+    return {'segments': segments, 'steps_a': steps_a, 'steps_b': steps_b, 'ticks': ticks,
+            'pen_down_mm': pen_down, 'travel_mm': travel, 'feed_time_s': feed_time, 'out_of_bounds': out_of_bounds}
+
+def _grid_numpy(start_x, start_y, dx, dy, geometry):
+    """ pulley positions at ends of segments of moves from start_x, start_y by dx, dy """
+    max_d = np.maximum(np.abs(dx), np.abs(dy))
+    counts = np.maximum(1, np.ceil(max_d / geometry.max_seg_len)).astype(np.int64)
+    fewer = (counts > 1) & (max_d / np.maximum(counts - 1, 1) <= geometry.max_seg_len)
+    counts -= fewer
+    # segment end points of all commands
+    command = np.repeat(np.arange(len(counts)), counts)
+    k = np.arange(len(command)) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+    fraction = k / counts[command]
+    tx = start_x[command] + dx[command] * fraction - geometry.mount_x
+    ty = start_y[command] + dy[command] * fraction - geometry.mount_y
+    # PolarBot.calc_target_angles
+    sqr_arm_len = geometry.arm_len ** 2
+    sqr_dist = tx * tx + ty * ty
+    tool_dist = np.sqrt(sqr_dist)
+    beta = np.arccos(np.clip((2 * sqr_arm_len - sqr_dist) / (2 * sqr_arm_len), -1.0, 1.0))
+    base_angle = (pi - beta) / 2
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        alpha = np.where(tool_dist > 0, np.arccos(np.clip(np.abs(tx) / tool_dist, 0.0, 1.0)), 0.0)
+    angleA = np.where(tx <= 0, pi - (alpha + base_angle), alpha - base_angle)
+    # pulleys move by whole steps, positions stay on the step grid of start angles
+    startA, startB = geometry.start_angles
+    rads = geometry.rads_per_step
+    posA = np.rint((angleA - startA) / rads).astype(np.int64)
+    posB = np.rint((2 * pi - beta - startB) / rads).astype(np.int64)
+    return posA, posB
+
+def _plan_numpy(program, geometry):
+    lines = np.frombuffer(program.lines, dtype = np.dtype('l'))
+    xs = np.frombuffer(program.x, dtype = np.float64)
+    ys = np.frombuffer(program.y, dtype = np.float64)
+    pens = np.frombuffer(program.pen, dtype = np.int8)
+    feeds = np.frombuffer(program.feed, dtype = np.float64)
+    # commands out of bounds are skipped by bot, the tool stays in place
+    inside = (xs - geometry.mount_x) ** 2 + (ys - geometry.mount_y) ** 2 <= geometry.sqr_max_tool_dist
+    out_of_bounds = lines[~inside].tolist()
+    xs, ys, pens, feeds = xs[inside], ys[inside], pens[inside], feeds[inside]
+    if not len(xs):
+        return {'segments': 0, 'steps_a': 0, 'steps_b': 0, 'ticks': 0,
+                'pen_down_mm': 0.0, 'travel_mm': 0.0, 'feed_time_s': 0.0, 'out_of_bounds': out_of_bounds}
+    # every command starts at the target of the previous one
+    x0, y0 = geometry.start_position
+    start_x = np.concatenate(([x0], xs[:-1]))
+    start_y = np.concatenate(([y0], ys[:-1]))
+    dx, dy = xs - start_x, ys - start_y
+    dist = np.hypot(dx, dy)
+    with np.errstate(divide = 'ignore'):
+        feed_time = float(np.where(feeds > 0, dist / feeds * 60, 0.0).sum())
+    posA, posB = _grid_numpy(start_x, start_y, dx, dy, geometry)
+    da = np.abs(np.diff(posA, prepend = 0))
+    db = np.abs(np.diff(posB, prepend = 0))
+    # master pulley makes one step per tick, segments without steps are merged by planner
+    ticks = np.maximum(da, db)
+    return {'segments': int((ticks > 0).sum()), 'steps_a': int(da.sum()), 'steps_b': int(db.sum()), 'ticks': int(ticks.sum()),
+            'pen_down_mm': float(dist[pens != 0].sum()), 'travel_mm': float(dist[pens == 0].sum()),
+            'feed_time_s': feed_time, 'out_of_bounds': out_of_bounds}
+
+def estimate(program, bot):
+    """ estimate of program run by bot from its current pose, returns dict """
+    geometry = Geometry(bot)
+    result = _plan_numpy(program, geometry) if np is not None else _plan_python(program, geometry)
+    # controler sends commands ahead, so the bot steps on every tick
+    result['commands'] = len(program)
+    result['est_time_s'] = result['ticks'] * geometry.tick_interval / 1000
+    result['errors'] = ['line {}: {}'.format(line, error) for line, error in program.errors]
+    return result
+
+def segment_steps(program, bot):
+    """ signed steps of pulleys A and B in every segment of program run by bot from its current pose,
+        segments without steps are left out. numpy arrays when numpy is installed, see step_kernel.py """
+    geometry = Geometry(bot)
+    mount_x, mount_y = geometry.mount_x, geometry.mount_y
+    sqr_max_tool_dist = geometry.sqr_max_tool_dist
+    if np is not None:
+        xs = np.frombuffer(program.x, dtype = np.float64)
+        ys = np.frombuffer(program.y, dtype = np.float64)
+        inside = (xs - mount_x) ** 2 + (ys - mount_y) ** 2 <= sqr_max_tool_dist
+        xs, ys = xs[inside], ys[inside]
+        if not len(xs):
+            return np.zeros(0, np.int64), np.zeros(0, np.int64)
+        x0, y0 = geometry.start_position
+        start_x = np.concatenate(([x0], xs[:-1]))
+        start_y = np.concatenate(([y0], ys[:-1]))
+        posA, posB = _grid_numpy(start_x, start_y, xs - start_x, ys - start_y, geometry)
+        da = np.diff(posA, prepend = 0)
+        db = np.diff(posB, prepend = 0)
+        moving = (da != 0) | (db != 0)
+        return da[moving], db[moving]
+    out = (array('q'), array('q'))
+    tool_x, tool_y = geometry.start_position
+    posA = posB = 0
+    for x, y in zip(program.x, program.y):
+        if (x - mount_x) ** 2 + (y - mount_y) ** 2 > sqr_max_tool_dist:
+            continue
+        posA, posB = _plan_move(geometry, tool_x, tool_y, posA, posB, x, y, out)[:2]
+        tool_x, tool_y = x, y
+    return out
+
+def speed_limits(program, bot):
+    """ segments of program run by bot from its current pose whose feed is lowered by PolarBot.feed_limit.
+        regions are runs of consecutive limited lines: (first line, last line, (xmin, ymin, xmax, ymax), lowest feed ratio) """
+    geometry = Geometry(bot)
+    mount_x, mount_y = geometry.mount_x, geometry.mount_y
+    sqr_max_tool_dist = geometry.sqr_max_tool_dist
+    tool_x, tool_y = geometry.start_position
+    segments = limited = 0
+    feed_time = limited_time = 0.0
+    regions = []
+    for line, x, y, feed in zip(program.lines, program.x, program.y, program.feed):
+        if (x - mount_x) ** 2 + (y - mount_y) ** 2 > sqr_max_tool_dist:
+            continue
+        dx, dy = x - tool_x, y - tool_y
+        count = _segments(dx, dy, geometry.max_seg_len)
+        seg_dx, seg_dy = dx / count, dy / count
+        seg_len = sqrt(seg_dx ** 2 + seg_dy ** 2)
+        for k in range(1, count + 1):
+            seg_x, seg_y = tool_x + seg_dx * k, tool_y + seg_dy * k
+            try:
+                angleA, angleB = bot.inverse_kinematics(seg_x, seg_y)
+            except ValueError:
+                # segment end at mount point, bot rejects the command
+                continue
+            limit = bot.feed_limit(angleA, angleB, seg_dx, seg_dy, feed)
+            segments += 1
+            if feed <= 0:
+                continue
+            feed_time += seg_len / feed * 60
+            limited_time += seg_len / limit * 60
+            if limit >= feed:
+                continue
+            limited += 1
+            if regions and regions[-1][1] >= line - 1:
+                first, last, bbox, ratio = regions[-1]
+                bbox = (min(bbox[0], seg_x), min(bbox[1], seg_y), max(bbox[2], seg_x), max(bbox[3], seg_y))
+                regions[-1] = (first, line, bbox, min(ratio, limit / feed))
+            else:
+                regions.append((line, line, (seg_x, seg_y, seg_x, seg_y), limit / feed))
+        tool_x, tool_y = x, y
+    return {'segments': segments, 'limited_segments': limited, 'feed_time_s': feed_time,
+            'limited_time_s': limited_time, 'regions': regions}
+
+class _Table:
+    """ rows of values stored as columns, see IncrementalEstimator """
+    def __init__(self, types):
+        # 'o' is a list column of any objects
+        self.types = types
+        self.columns = [[] if t == 'o' else array(t) for t in types]
+
+    def __len__(self):
+        return len(self.columns[0])
+
+    def append(self, row):
+        for column, value in zip(self.columns, row):
+            column.append(value)
+
+    def row(self, i):
+        return tuple(column[i] for column in self.columns)
+
+    def splice(self, start, stop, other):
+        """ replace rows start:stop by rows of other table """
+        for column, new in zip(self.columns, other.columns):
+            column[start:stop] = new
+
+class IncrementalEstimator:
+    """ estimate of program which is edited between updates.
+        plan of every line is kept with the state it was planned from (tool position, pulley positions, feed),
+        update plans lines from the first changed one until a line of the old plan is reached with the same state """
+    # line kinds
+    EMPTY, MOVE, OUT_OF_BOUNDS, ERROR = 0, 1, 2, 3
+    # entry state of line: tool x, y, pulley positions A, B, feed
+    STATE_TYPES = 'ddqqd'
+    # plan of line: kind, pen, segments, steps A, steps B, ticks, distance, feed time, error text
+    PLAN_TYPES = 'bbqqqqddo'
+    # plans of removed lines kept for lines moved or restored by later edits
+    CACHE_SIZE = 100000
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.reset()
+
+    def reset(self):
+        self._geometry = None
+        self._key = None
+        self._lines = []
+        self._states = _Table(IncrementalEstimator.STATE_TYPES)
+        self._plans = _Table(IncrementalEstimator.PLAN_TYPES)
+        self._exit = None
+        self._totals = [0, 0, 0, 0, 0, 0.0, 0.0, 0.0]
+        # steps A, B and ticks
+        self._steps = [0, 0, 0]
+        self._cache = {}
+        # number of lines planned by the last update
+        self.planned = 0
+
+    def _plan_line(self, line, state):
+        # returns plan of line and state after it
+        cached = self._cache.get((line, state))
+        if cached is not None:
+            return cached
+        x0, y0, posA, posB, feed = state
+        parsed = parse_line(line, feed)
+        if parsed is None:
+            plan = (IncrementalEstimator.EMPTY, 0, 0, 0, 0, 0, 0.0, 0.0, None)
+        elif isinstance(parsed, str):
+            plan = (IncrementalEstimator.ERROR, 0, 0, 0, 0, 0, 0.0, 0.0, parsed)
+        else:
+            x, y, pen, feed = parsed
+            geometry = self._geometry
+            if (x - geometry.mount_x) ** 2 + (y - geometry.mount_y) ** 2 > geometry.sqr_max_tool_dist:
+                plan = (IncrementalEstimator.OUT_OF_BOUNDS, pen, 0, 0, 0, 0, 0.0, 0.0, None)
+            else:
+                dist = sqrt((x - x0) ** 2 + (y - y0) ** 2)
+                posA, posB, segments, steps_a, steps_b, ticks = _plan_move(geometry, x0, y0, posA, posB, x, y)
+                plan = (IncrementalEstimator.MOVE, pen, segments, steps_a, steps_b, ticks, dist, dist / feed * 60 if feed > 0 else 0.0, None)
+                x0, y0 = x, y
+        return plan, (x0, y0, posA, posB, feed)
+
+    def _add(self, plan, sign):
+        totals = self._totals
+        kind, pen = plan[0], plan[1]
+        totals[kind] += sign
+        if kind == IncrementalEstimator.MOVE:
+            totals[4] += sign * plan[2]
+            # pen down and travel distance
+            totals[5 if pen else 6] += sign * plan[6]
+            totals[7] += sign * plan[7]
+            for i in range(3):
+                self._steps[i] += sign * plan[3 + i]
+
+    def update(self, text):
+        """ estimate of program text, returns dict like estimate() """
+        geometry = Geometry(self.bot)
+        key = (geometry.start_position, geometry.start_angles, geometry.mount_x, geometry.mount_y, geometry.arm_len, geometry.tick_interval)
+        if key != self._key:
+            # bot moved or changed, nothing can be reused
+            self.reset()
+            self._key = key
+            self._exit = geometry.start_position + (0, 0, DEFAULT_FEED)
+        self._geometry = geometry
+        lines = text.upper().split('\n')
+        old = self._lines
+        states, plans = self._states, self._plans
+        # common prefix and suffix of old and new lines
+        limit = min(len(old), len(lines))
+        start = 0
+        while start < limit and old[start] == lines[start]:
+            start += 1
+        suffix = 0
+        while suffix < limit - start and old[-1 - suffix] == lines[-1 - suffix]:
+            suffix += 1
+        shift = len(lines) - len(old)
+        # plan changed lines until old plan is reached with the same state
+        new_states = _Table(IncrementalEstimator.STATE_TYPES)
+        new_plans = _Table(IncrementalEstimator.PLAN_TYPES)
+        state = states.row(start) if start < len(old) else self._exit
+        i = start
+        while i < len(lines):
+            if i >= len(lines) - suffix and states.row(i - shift) == state:
+                break
+            new_states.append(state)
+            plan, state = self._plan_line(lines[i], state)
+            new_plans.append(plan)
+            self._add(plan, 1)
+            i += 1
+        self.planned = i - start
+        stop = i - shift
+        # replaced lines stay in cache
+        if len(self._cache) > IncrementalEstimator.CACHE_SIZE:
+            self._cache.clear()
+        for j in range(start, stop):
+            plan = plans.row(j)
+            self._add(plan, -1)
+            exit = states.row(j + 1) if j + 1 < len(old) else self._exit
+            self._cache[(old[j], states.row(j))] = (plan, exit)
+        if i == len(lines):
+            self._exit = state
+        states.splice(start, stop, new_states)
+        plans.splice(start, stop, new_plans)
+        self._lines = lines
+        return self.result()
+
+    def result(self):
+        totals = self._totals
+        kinds = self._plans.columns[0]
+        result = {
+            'commands': totals[IncrementalEstimator.MOVE] + totals[IncrementalEstimator.OUT_OF_BOUNDS],
+            'segments': totals[4],
+            'steps_a': self._steps[0],
+            'steps_b': self._steps[1],
+            'ticks': self._steps[2],
+            'pen_down_mm': totals[5],
+            'travel_mm': totals[6],
+            'feed_time_s': totals[7],
+            'out_of_bounds': [],
+            'errors': [],
+        }
+        result['est_time_s'] = result['ticks'] * self._geometry.tick_interval / 1000
+        # lines are looked up only when there are some
+        if totals[IncrementalEstimator.OUT_OF_BOUNDS]:
+            result['out_of_bounds'] = [i + 1 for i, kind in enumerate(kinds) if kind == IncrementalEstimator.OUT_OF_BOUNDS]
+        if totals[IncrementalEstimator.ERROR]:
+            errors = self._plans.columns[-1]
+            result['errors'] = ['line {}: {}'.format(i + 1, errors[i]) for i, kind in enumerate(kinds) if kind == IncrementalEstimator.ERROR]
+        return result
+
+def estimate_text(text, bot = None, **kwargs):
+    """ estimate of program text, by default for a new bot of width x height area """
+    if bot is None:
+        from headless import HeadlessControler
+        from polarbot import PolarBot
+        controler = HeadlessControler(tick_interval = kwargs.get('tick_interval', HeadlessControler.TICK_INTERVAL))
+        bot = PolarBot(controler, width = kwargs.get('width', 800), height = kwargs.get('height', 600))
+    return estimate(parse_program(text, kwargs.get('feed', DEFAULT_FEED)), bot)
+
+def format_duration(seconds):
+    minutes, seconds = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return '{}:{:02}:{:02}'.format(hours, minutes, seconds)
+
+def summary_lines(result):
+    """ readout of estimate for UI and console """
+    lines = ['commands={} segments={}'.format(result['commands'], result['segments']),
+             'steps a={} b={}'.format(result['steps_a'], result['steps_b']),
+             'pen down={:.0f}mm travel={:.0f}mm'.format(result['pen_down_mm'], result['travel_mm']),
+             'time={} feed time={}'.format(format_duration(result['est_time_s']), format_duration(result['feed_time_s']))]
+    if result['out_of_bounds']:
+        lines.append('out of bounds lines={}'.format(len(result['out_of_bounds'])))
+    if result['errors']:
+        lines.append('errors={}'.format(len(result['errors'])))
+    return lines
+
+def main():
+    parser = argparse.ArgumentParser(description = 'estimate steps, distance and time of G-code program')
+    parser.add_argument('path')
+    parser.add_argument('--tick-interval', type = int, default = 10, help = 'tick interval of controler in ms')
+    parser.add_argument('--width', type = float, default = 800)
+    parser.add_argument('--height', type = float, default = 600)
+    parser.add_argument('--max-steps-per-s', type = float, default = None, help = 'max speed of pulleys')
+    parser.add_argument('--limits', action = 'store_true', help = 'report regions slowed down by speed of pulleys')
+    args = parser.parse_args()
+
+    from headless import HeadlessControler
+    from polarbot import PolarBot
+    bot = PolarBot(HeadlessControler(tick_interval = args.tick_interval), width = args.width, height = args.height)
+    if args.max_steps_per_s:
+        bot.max_steps_per_s = args.max_steps_per_s
+    with open(args.path) as f:
+        text = f.read()
+    result = estimate_text(text, bot)
+    for line in summary_lines(result):
+        print(line)
+    for error in result['errors']:
+        print(error)
+    if args.limits:
+        limits = speed_limits(parse_program(text), bot)
+        print('limited segments={} of {}, feed time={} limited={}'.format(limits['limited_segments'], limits['segments'],
+              format_duration(limits['feed_time_s']), format_duration(limits['limited_time_s'])))
+        for first, last, bbox, ratio in limits['regions']:
+            print('lines {}-{} x={:.1f}..{:.1f} y={:.1f}..{:.1f} feed down to {:.0%}'.format(first, last, bbox[0], bbox[2], bbox[1], bbox[3], ratio))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# G-code program in a memory mapped file with index of line offsets, for programs too large
+# for a Tk text widget. lines are decoded only when they are read, the program is split the same
+# way as text.split('\n') of controlers, so line numbers of both are the same.
+# ProgramFile is a sequence of lines, it can be passed where controlers and PolarBot.state_at
+# expect a list of program lines.
+#
+# usage: program_file.py <program.gcode> [--line N] [--count 10]   print lines of program
+
+import os
+import sys
+import mmap
+import zlib
+import argparse
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class ProgramFile:
+    def __init__(self, path, temporary = False):
+        self.path = path
+        # temporary file is removed on close
+        self.temporary = temporary
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        # empty file can not be mapped
+        self._data = mmap.mmap(self._file.fileno(), 0, access = mmap.ACCESS_READ) if size else b''
+        self._starts = self._index(self._data)
+        self._id = None
+
+    @staticmethod
+    def _index(data):
+        # offsets where lines start, the last one is one past the end
+        if np is not None and len(data):
+            ends = np.flatnonzero(np.frombuffer(data, dtype = np.uint8) == 10)
+            starts = array('q', [0])
+            starts.frombytes((ends + 1).astype(np.int64).tobytes())
+        else:
+            starts = array('q', [0])
+            find = data.find
+            i = find(b'\n')
+            while i >= 0:
+                starts.append(i + 1)
+                i = find(b'\n', i + 1)
+        starts.append(len(data) + 1)
+        return starts
+
+    @classmethod
+    def from_text(cls, text, path = None):
+        """ program of text written to path, by default to a temporary file removed on close """
+        if path is None:
+            import tempfile
+            fd, path = tempfile.mkstemp(suffix = '.gcode')
+            with os.fdopen(fd, 'w', encoding = 'utf-8', newline = '') as f:
+                f.write(text)
+            return cls(path, temporary = True)
+        with open(path, 'w', encoding = 'utf-8', newline = '') as f:
+            f.write(text)
+        return cls(path)
+
+    def __len__(self):
+        return len(self._starts) - 1
+
+    def __getitem__(self, index):
+        """ text of line at 0 based index, like item of text.split('\n') """
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('line index out of range')
+        return self._data[self._starts[index]:self._starts[index + 1] - 1].decode('utf-8', 'replace')
+
+    def line(self, number):
+        """ text of line number (1 based) """
+        return self[number - 1]
+
+    def iter_from(self, number = 1):
+        """ lines from line number (1 based) to the end, decoded one by one """
+        for i in range(number - 1, len(self)):
+            yield self[i]
+
+    def __iter__(self):
+        return self.iter_from(1)
+
+    @property
+    def id(self):
+        """ crc32 of file contents, identifies program of checkpoints like checkpoint.program_id """
+        if self._id is None:
+            self._id = zlib.crc32(self._data)
+        return self._id
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+        if self.temporary and os.path.exists(self.path):
+            os.remove(self.path)
+
+def main():
+    parser = argparse.ArgumentParser(description = 'print lines of G-code program from memory mapped file')
+    parser.add_argument('path')
+    parser.add_argument('--line', type = int, default = 1, help = 'first line to print')
+    parser.add_argument('--count', type = int, default = 10, help = 'number of lines to print')
+    args = parser.parse_args()
+
+    from time import perf_counter
+    started = perf_counter()
+    program = ProgramFile(args.path)
+    print('lines={} indexed in {:.1f}ms'.format(len(program), (perf_counter() - started) * 1000))
+    for number in range(args.line, min(args.line + args.count, len(program) + 1)):
+        print('{:>7} {}'.format(number, program.line(number)))
+    program.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
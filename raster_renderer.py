@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# offscreen renderer of tool path for job previews without a display.
+# collects pen down polylines from bot updates and rasterizes them in one pass
+# when image is saved. uses PIL when it is installed, lines are drawn at SUPERSAMPLE times
+# the size and downscaled, so they are anti-aliased like without PIL, where anti-aliased
+# lines (Xiaolin Wu) are drawn into a grayscale buffer and written as PNG.
+#
+# usage: raster_renderer.py <program.gcode | trajectory.pbtr> [-o preview.png] [--dpi N]
+
+import sys
+import zlib
+import struct
+import argparse
+from array import array
+from math import floor
+
+try:
+    from PIL import Image, ImageDraw
+except ImportError:
+    Image = None
+
+from executor import Executor
+from polarbot import forward_kinematics
+
+MM_PER_INCH = 25.4
+
+def write_png(path, width, height, pixels):
+    """ write 8 bit grayscale image, pixels is bytes-like of width * height """
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+    raw = bytearray()
+    for y in range(height):
+        # filter type 0 for every row
+        raw.append(0)
+        raw += pixels[y * width:(y + 1) * width]
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(bytes(raw), 6)))
+        f.write(chunk(b'IEND', b''))
+
+class RasterRenderer(Executor):
+    """ executor rendering pen down tool path into an image """
+    batch_updates = True
+    DEFAULT_DPI = 25.4
+    # image of PIL is drawn this many times larger and downscaled
+    SUPERSAMPLE = 4
+
+    def __init__(self, dpi = DEFAULT_DPI, background = 255, ink = 0):
+        self.dpi = dpi
+        self.background = background
+        self.ink = ink
+        self.width = 0
+        self.height = 0
+        # pen down polylines, flat arrays of x, y in mm
+        self.polylines = []
+        self._line = None
+        self._pen = False
+        self._last = None
+
+    def init(self, width, height, mount_point, arm_len):
+        self.width = width
+        self.height = height
+        self.mount_point = mount_point
+        self.armA_len = arm_len
+        self.armB_len = arm_len
+
+    def update(self, angleA, angleB, force_redraw = False):
+        self.update_batch(((angleA, angleB),))
+
+    def update_batch(self, angles):
+        mount_point, armA_len, armB_len = self.mount_point, self.armA_len, self.armB_len
+        last = None
+        for angleA, angleB in angles:
+            last = forward_kinematics(mount_point, armA_len, armB_len, angleA, angleB)[2:]
+            if self._pen:
+                self._line.extend(last)
+        if last is not None:
+            self._last = last
+
+    def set_tool(self, state = True):
+        self._pen = bool(state)
+        if self._pen:
+            # new polyline starts at current tool position
+            self._line = array('d', self._last or ())
+            self.polylines.append(self._line)
+
+    def clear(self):
+        self.polylines = []
+        self._line = None
+        if self._pen:
+            self.set_tool(True)
+
+    def scale(self):
+        """ pixels per mm """
+        return self.dpi / MM_PER_INCH
+
+    def _pixel_polylines(self, min_dist = 0.5, factor = 1):
+        # polylines in pixels of image factor times larger, points closer than min_dist pixels
+        # of image to previous point are dropped
+        scale = self.scale() * factor
+        min_dist *= factor
+        sqr_min_dist = min_dist ** 2
+        for line in self.polylines:
+            if len(line) < 4:
+                continue
+            points = [(line[0] * scale, line[1] * scale)]
+            for i in range(2, len(line), 2):
+                x, y = line[i] * scale, line[i + 1] * scale
+                px, py = points[-1]
+                if (x - px) ** 2 + (y - py) ** 2 >= sqr_min_dist:
+                    points.append((x, y))
+            if len(points) == 1:
+                points.append((line[-2] * scale, line[-1] * scale))
+            yield points
+
+    def image_size(self):
+        scale = self.scale()
+        return max(1, round(self.width * scale)), max(1, round(self.height * scale))
+
+    def render(self):
+        """ returns (width, height, grayscale pixels) """
+        width, height = self.image_size()
+        if Image is not None:
+            factor = RasterRenderer.SUPERSAMPLE
+            image = Image.new('L', (width * factor, height * factor), self.background)
+            draw = ImageDraw.Draw(image)
+            for points in self._pixel_polylines(factor = factor):
+                # one pixel wide line after downscale
+                draw.line(points, fill = self.ink, width = factor)
+            image = image.resize((width, height), getattr(Image, 'Resampling', Image).LANCZOS)
+            return width, height, image.tobytes()
+        pixels = bytearray([self.background]) * (width * height)
+        for points in self._pixel_polylines():
+            for i in range(1, len(points)):
+                self._wu_line(pixels, width, height, points[i - 1], points[i])
+        return width, height, pixels
+
+    def _wu_line(self, pixels, width, height, p0, p1):
+        # anti-aliased line, coverage blends background to ink
+        background, ink = self.background, self.ink
+        def plot(x, y, coverage):
+            if 0 <= x < width and 0 <= y < height:
+                i = y * width + x
+                value = pixels[i] + (ink - background) * coverage
+                pixels[i] = min(255, max(0, round(value)))
+        x0, y0 = p0
+        x1, y1 = p1
+        steep = abs(y1 - y0) > abs(x1 - x0)
+        if steep:
+            x0, y0, x1, y1 = y0, x0, y1, x1
+        if x0 > x1:
+            x0, x1, y0, y1 = x1, x0, y1, y0
+        dx = x1 - x0
+        gradient = (y1 - y0) / dx if dx else 1.0
+        y = y0 + gradient * (round(x0) - x0)
+        for x in range(round(x0), round(x1) + 1):
+            fy = floor(y)
+            frac = y - fy
+            if steep:
+                plot(fy, x, 1 - frac)
+                plot(fy + 1, x, frac)
+            else:
+                plot(x, fy, 1 - frac)
+                plot(x, fy + 1, frac)
+            y += gradient
+
+    def save_png(self, path):
+        width, height, pixels = self.render()
+        write_png(path, width, height, pixels)
+
+    def save_svg(self, path):
+        """ vector preview, coordinates in mm """
+        with open(path, 'w') as f:
+            f.write('<svg xmlns="http://www.w3.org/2000/svg" width="{0}mm" height="{1}mm" viewBox="0 0 {0} {1}">\n'.format(self.width, self.height))
+            f.write('<rect width="100%" height="100%" fill="white"/>\n')
+            for points in self._pixel_polylines_mm():
+                f.write('<polyline fill="none" stroke="black" stroke-width="0.3" points="{}"/>\n'.format(
+                    ' '.join('{:.2f},{:.2f}'.format(x, y) for x, y in points)))
+            f.write('</svg>\n')
+
+    def _pixel_polylines_mm(self):
+        # polylines in mm with the same point reduction as raster output
+        scale = self.scale()
+        for points in self._pixel_polylines():
+            yield [(x / scale, y / scale) for x, y in points]
+
+    def save(self, path):
+        if path.lower().endswith('.svg'):
+            self.save_svg(path)
+        else:
+            self.save_png(path)
+
+def main():
+    parser = argparse.ArgumentParser(description = 'render preview of G-code program or trajectory file')
+    parser.add_argument('path')
+    parser.add_argument('-o', '--output', default = 'preview.png', help = 'output file, .png or .svg')
+    parser.add_argument('--dpi', type = float, default = RasterRenderer.DEFAULT_DPI)
+    args = parser.parse_args()
+
+    renderer = RasterRenderer(args.dpi)
+    if args.path.lower().endswith('.pbtr'):
+        from trajectory import TrajectoryReader, Replayer
+        with TrajectoryReader(args.path) as reader:
+            Replayer(reader, renderer).run()
+    else:
+        from batch_sim import simulate_text
+        with open(args.path) as f:
+            result = simulate_text(f.read(), executors = [renderer])
+        if not result['success']:
+            print('program failed: out of bounds lines={} errors={}'.format(result['out_of_bounds'], result['errors']))
+    renderer.save(args.output)
+    print('preview saved to {}'.format(args.output))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# executor streaming moves of PolarBot to a plotter controller over serial link.
+# every finished segment becomes one block "G1 A<steps> B<steps>" with absolute pulley
+# positions in steps, followed by " F<mm/min>" when feed of segments changes, feed is
+# lowered by bot where a pulley would exceed its max speed. pen state changes become
+# "M3" (down) and "M5" (up).
+# blocks are sent without waiting for every "ok": in 'chars' flow mode as many blocks
+# as fit into receive buffer of controller are in flight (character counting), in
+# 'window' mode up to window blocks are in flight.
+#
+# usage: serial_driver.py <program.gcode> --port /dev/ttyUSB0 [--baudrate 115200]
+#        serial_driver.py <program.gcode> --fake        stream to pty based fake device
+
+import os
+import sys
+import pty
+import tty
+import select
+import argparse
+import threading
+from collections import deque
+from time import perf_counter, sleep
+
+try:
+    import serial
+except ImportError:
+    serial = None
+
+from executor import Executor
+
+class SerialLink:
+    """ non-blocking byte link, pyserial port or raw tty device """
+    def __init__(self, port, baudrate = 115200):
+        self.port = port
+        if serial is not None:
+            self._serial = serial.Serial(port, baudrate, timeout = 0, write_timeout = 1)
+            self._fd = None
+        else:
+            # without pyserial the device is used as raw tty, baudrate is not changed
+            self._serial = None
+            self._fd = os.open(port, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+            tty.setraw(self._fd)
+
+    def write(self, data):
+        if self._serial is not None:
+            self._serial.write(data)
+            return
+        view = memoryview(data)
+        while view:
+            try:
+                n = os.write(self._fd, view)
+            except BlockingIOError:
+                select.select([], [self._fd], [], 0.1)
+                continue
+            view = view[n:]
+
+    def read(self, timeout = 0.0):
+        """ available bytes, waits up to timeout seconds for first byte """
+        if self._serial is not None:
+            data = self._serial.read(self._serial.in_waiting or 0)
+            if not data and timeout:
+                self._serial.timeout = timeout
+                data = self._serial.read(1)
+                self._serial.timeout = 0
+            return data
+        if not select.select([self._fd], [], [], timeout)[0]:
+            return b''
+        try:
+            return os.read(self._fd, 4096)
+        except BlockingIOError:
+            return b''
+
+    def close(self):
+        if self._serial is not None:
+            self._serial.close()
+        elif self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+class StreamingDriver(Executor):
+    """ executor sending segment blocks to controller with windowed flow control """
+    batch_updates = True
+    FLOW_MODES = ('chars', 'window')
+    # receive buffer of controller in bytes, grbl uses 128
+    RX_BUFFER_SIZE = 128
+    WINDOW = 4
+
+    def __init__(self, link, rads_per_step, flow = 'chars', rx_buffer_size = RX_BUFFER_SIZE, window = WINDOW):
+        if flow not in StreamingDriver.FLOW_MODES:
+            raise ValueError('invalid flow mode "{}". must be one of {}'.format(flow, StreamingDriver.FLOW_MODES))
+        self.link = link
+        self.rads_per_step = rads_per_step
+        self.flow = flow
+        self.rx_buffer_size = rx_buffer_size
+        self.window = window
+        self._start = None
+        self._last_block = None
+        # feed of next block and feed last sent
+        self._feed = None
+        self._sent_feed = None
+        # blocks waiting to be sent and lengths of blocks sent but not acknowledged
+        self._queue = deque()
+        self._in_flight = deque()
+        self._in_flight_chars = 0
+        self._rx = b''
+        # stats
+        self.sent = 0
+        self.acked = 0
+        self.errors = []
+        self.max_fill = 0
+        self._fill_total = 0
+        self._started = None
+
+    def init(self, width, height, mount_point, arm_len):
+        pass
+
+    def update(self, angleA, angleB, force_redraw = False):
+        self.update_batch(((angleA, angleB),))
+
+    def update_batch(self, angles):
+        # only the end of the delivered steps is sent, bot flushes batches at the end of every segment
+        angleA, angleB = angles[-1]
+        if self._start is None:
+            # positions are counted from angles of the first update
+            self._start = (angleA, angleB)
+        posA = round((angleA - self._start[0]) / self.rads_per_step)
+        posB = round((angleB - self._start[1]) / self.rads_per_step)
+        if (posA, posB) != self._last_block:
+            self._last_block = (posA, posB)
+            block = 'G1 A{} B{}'.format(posA, posB)
+            if self._feed is not None and self._feed != self._sent_feed:
+                self._sent_feed = self._feed
+                block += ' F{:.1f}'.format(self._feed)
+            self.send(block)
+
+    def set_feed(self, feed):
+        self._feed = feed
+
+    def set_tool(self, state = True):
+        self.send('M3' if state else 'M5')
+
+    def send(self, block):
+        """ queue block and send as many queued blocks as flow control allows """
+        self._queue.append((block + '\n').encode('ascii'))
+        self.pump()
+
+    def _can_send(self, data):
+        if not self._in_flight:
+            return True
+        if self.flow == 'chars':
+            return self._in_flight_chars + len(data) <= self.rx_buffer_size
+        return len(self._in_flight) < self.window
+
+    def pump(self, timeout = 0.0):
+        """ read acknowledgements and send queued blocks, returns number of blocks in flight """
+        self._read_responses(timeout)
+        while self._queue and self._can_send(self._queue[0]):
+            data = self._queue.popleft()
+            if self._started is None:
+                self._started = perf_counter()
+            self.link.write(data)
+            self._in_flight.append(len(data))
+            self._in_flight_chars += len(data)
+            self.sent += 1
+            fill = self._in_flight_chars / self.rx_buffer_size
+            self.max_fill = max(self.max_fill, fill)
+            self._fill_total += fill
+        return len(self._in_flight)
+
+    def _read_responses(self, timeout):
+        self._rx += self.link.read(timeout)
+        while b'\n' in self._rx:
+            line, self._rx = self._rx.split(b'\n', 1)
+            line = line.strip()
+            if not line:
+                continue
+            if line == b'ok' or line.startswith(b'error'):
+                if line != b'ok':
+                    self.errors.append((self.acked, line.decode('ascii', 'replace')))
+                if self._in_flight:
+                    self._in_flight_chars -= self._in_flight.popleft()
+                self.acked += 1
+
+    def drain(self, timeout = 10.0):
+        """ wait until all blocks are acknowledged """
+        deadline = perf_counter() + timeout
+        while self._queue or self._in_flight:
+            if perf_counter() > deadline:
+                raise Exception('controller did not acknowledge {} blocks in {}s'.format(len(self._queue) + len(self._in_flight), timeout))
+            self.pump(0.05)
+
+    def stats(self):
+        elapsed = perf_counter() - self._started if self._started else 0.0
+        return {
+            'sent': self.sent,
+            'acked': self.acked,
+            'queued': len(self._queue),
+            'in_flight': len(self._in_flight),
+            'errors': len(self.errors),
+            'blocks_per_s': self.acked / elapsed if elapsed else 0.0,
+            'avg_fill': self._fill_total / self.sent if self.sent else 0.0,
+            'max_fill': self.max_fill,
+        }
+
+class FakeDevice:
+    """ pty based controller: acknowledges blocks with "ok" after processing time,
+        reports overflow of its receive buffer """
+    def __init__(self, rx_buffer_size = StreamingDriver.RX_BUFFER_SIZE, block_time = 0.001):
+        self.rx_buffer_size = rx_buffer_size
+        self.block_time = block_time
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self.blocks = []
+        self.overflows = 0
+        self._running = True
+        self._thread = threading.Thread(target = self._run, daemon = True)
+        self._thread.start()
+
+    def _run(self):
+        buffer = b''
+        while self._running:
+            if select.select([self._master], [], [], 0.01)[0]:
+                try:
+                    buffer += os.read(self._master, 4096)
+                except OSError:
+                    break
+                if len(buffer) > self.rx_buffer_size:
+                    self.overflows += 1
+            while b'\n' in buffer:
+                line, buffer = buffer.split(b'\n', 1)
+                # block is processed, its place in receive buffer is free after that
+                sleep(self.block_time)
+                block = line.decode('ascii', 'replace').strip()
+                self.blocks.append(block)
+                response = b'ok\n' if block[:2] in ('G1', 'M3', 'M5') else b'error:20\n'
+                os.write(self._master, response)
+
+    def close(self):
+        self._running = False
+        self._thread.join(1)
+        os.close(self._master)
+        os.close(self._slave)
+
+def main():
+    parser = argparse.ArgumentParser(description = 'stream G-code program to plotter controller')
+    parser.add_argument('path')
+    parser.add_argument('--port', default = None)
+    parser.add_argument('--baudrate', type = int, default = 115200)
+    parser.add_argument('--fake', action = 'store_true', help = 'stream to pty based fake device')
+    parser.add_argument('--flow', choices = StreamingDriver.FLOW_MODES, default = 'chars')
+    args = parser.parse_args()
+    if not args.port and not args.fake:
+        parser.error('--port or --fake is required')
+
+    from headless import HeadlessControler
+    from polarbot import PolarBot
+    device = FakeDevice() if args.fake else None
+    link = SerialLink(device.port if device else args.port, args.baudrate)
+    controler = HeadlessControler()
+    bot = PolarBot(controler)
+    driver = StreamingDriver(link, bot.pulleyA.get_rads_per_step(), args.flow)
+    bot.add_executor(driver)
+    with open(args.path) as f:
+        controler.load_program(f.read())
+    controler.run()
+    bot.rem_executor(driver)
+    driver.drain()
+    print(driver.stats())
+    if device:
+        print('device blocks={} overflows={}'.format(len(device.blocks), device.overflows))
+        device.close()
+    link.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# step/direction stream of a whole program in one call, for headless simulation and compilation
+# of step streams. segments are interpolated like PolarBot.on_tick does it: master pulley (the one
+# with more steps, A on tie) steps on every tick, error starts at half of master steps, every tick
+# remaining steps of slave are subtracted from error and when it is negative, slave steps and
+# remaining steps of master are added.
+# stream has one byte per tick, bits STEP_A, DIR_A, STEP_B, DIR_B, direction bit is set for
+# positive rotation. with numba installed the loop is compiled, otherwise the stream of every
+# segment is looked up in a cache of segments with the same steps, segments of a program
+# repeat a lot.
+#
+# usage: step_kernel.py <program.gcode> [-o stream.bin] [--width W] [--height H]
+
+import sys
+import argparse
+from time import perf_counter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+STEP_A, DIR_A, STEP_B, DIR_B = 1, 2, 4, 8
+# number of cached segment streams
+CACHE_SIZE = 65536
+
+def _stream_loop(steps_a, steps_b, out):
+    # fills out with stream of segments, returns number of ticks
+    tick = 0
+    for i in range(len(steps_a)):
+        a = steps_a[i]
+        b = steps_b[i]
+        dirs = (DIR_A if a > 0 else 0) | (DIR_B if b > 0 else 0)
+        a, b = abs(a), abs(b)
+        if a >= b:
+            master, slave, master_bit, slave_bit = a, b, STEP_A, STEP_B
+        else:
+            master, slave, master_bit, slave_bit = b, a, STEP_B, STEP_A
+        error = master / 2
+        while master:
+            master -= 1
+            bits = dirs | master_bit
+            error -= slave
+            if error < 0:
+                if slave:
+                    slave -= 1
+                    bits |= slave_bit
+                error += master
+            out[tick] = bits
+            tick += 1
+    return tick
+
+_stream_jit = numba.njit(cache = True, nogil = True)(_stream_loop) if numba is not None else None
+
+_cache = {}
+
+def segment_stream(a, b):
+    """ stream of one segment with signed steps a, b of pulleys """
+    key = (a, b)
+    stream = _cache.get(key)
+    if stream is None:
+        out = bytearray(max(abs(a), abs(b)))
+        _stream_loop((a,), (b,), out)
+        stream = bytes(out)
+        if len(_cache) >= CACHE_SIZE:
+            _cache.clear()
+        _cache[key] = stream
+    return stream
+
+def step_stream(steps_a, steps_b):
+    """ stream of segments with signed steps of pulleys A and B, sequences of the same length, returns bytes """
+    if len(steps_a) != len(steps_b):
+        raise ValueError('steps of pulleys differ in length: {} and {}'.format(len(steps_a), len(steps_b)))
+    if _stream_jit is not None:
+        steps_a = np.asarray(steps_a, dtype = np.int64)
+        steps_b = np.asarray(steps_b, dtype = np.int64)
+        out = np.empty(int(np.maximum(np.abs(steps_a), np.abs(steps_b)).sum()), dtype = np.uint8)
+        _stream_jit(steps_a, steps_b, out)
+        return out.tobytes()
+    if np is not None and isinstance(steps_a, np.ndarray):
+        # python ints are hashed and compared faster
+        steps_a, steps_b = steps_a.tolist(), steps_b.tolist()
+    cache = _cache
+    streams = []
+    for key in zip(steps_a, steps_b):
+        stream = cache.get(key)
+        if stream is None:
+            stream = segment_stream(*key)
+        streams.append(stream)
+    return b''.join(streams)
+
+def step_counts(stream):
+    """ (steps A, steps B, ticks) of stream """
+    counts = [stream.count(value) for value in range(16)]
+    return (sum(counts[value] for value in range(16) if value & STEP_A),
+            sum(counts[value] for value in range(16) if value & STEP_B),
+            len(stream))
+
+def compile_text(text, bot = None, **kwargs):
+    """ stream of program text run from current pose of bot, by default of a new bot of width x height area """
+    from preflight import parse_program, segment_steps, DEFAULT_FEED
+    if bot is None:
+        from headless import HeadlessControler
+        from polarbot import PolarBot
+        bot = PolarBot(HeadlessControler(), width = kwargs.get('width', 800), height = kwargs.get('height', 600))
+    return step_stream(*segment_steps(parse_program(text, kwargs.get('feed', DEFAULT_FEED)), bot))
+
+def main():
+    parser = argparse.ArgumentParser(description = 'compile G-code program to step/direction stream of PolarBot')
+    parser.add_argument('path')
+    parser.add_argument('-o', '--output', default = None, help = 'file to write stream to, one byte per tick')
+    parser.add_argument('--width', type = float, default = 800)
+    parser.add_argument('--height', type = float, default = 600)
+    args = parser.parse_args()
+
+    with open(args.path) as f:
+        text = f.read()
+    started = perf_counter()
+    stream = compile_text(text, width = args.width, height = args.height)
+    elapsed = perf_counter() - started
+    steps_a, steps_b, ticks = step_counts(stream)
+    print('steps a={} b={} ticks={} in {:.3f}s, kernel={}'.format(
+        steps_a, steps_b, ticks, elapsed, 'numba' if _stream_jit is not None else 'python'))
+    if args.output:
+        with open(args.output, 'wb') as f:
+            f.write(stream)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,433 +1,96 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-WIDTH = 800
-HEIGHT = 600
-
 import tkinter as TK
 from tkinter.messagebox import showinfo, showerror, showwarning
-from math import sqrt, pi, cos, acos
-from time import sleep
-from event_dispatcher import EventDispatcher as dispatcher
-    
-class Point:
-    def __init__(self, x, y):
-        self.set(x, y)
-    
-    def __getattr__(self, name):
-        if name in self.__dict__:
-            return self.__dict__[name]
-        elif name.upper() == 'X':
-            return self.__dict__['_x']
-        elif name.upper() == 'Y':
-            return self.__dict__['_y']
-        elif name.upper() == 'XY':
-            return (self.__dict__['_x'], self.__dict__['_y'])
-        else:
-            raise AttributeError('property "{}" not defined'.format(name))
-            
-    def __setattr__(self, name, val):
-        if name.upper() == 'X':
-            self.__dict__['_x'] = val
-        elif name.upper() == 'Y':
-            self.__dict__['_y'] = val
-        else:
-            raise AttributeError('property "{}" not defined'.format(name))
-            
-    def __str__(self):
-        return '({},{})'.format(self._x, self._y)
-    
-    def set(self, x, y):
-        self.__dict__['_x'] = x
-        self.__dict__['_y'] = y
- 
-    def copy(self):
-        return Point(self.x, self.y)
-        
-class Command:
-    CMD_SEP = ' ' 
-    SUPPORTED_CMD = ('G0, G1')
-    def __init__(self, **kwargs):
-        self._cmd_text = kwargs.get('cmd_text', None)
-        self._cmd = kwargs.get('cmd', None)
-        self._arg_x = kwargs.get('x', None)
-        self._arg_y = kwargs.get('y', None)
-        self._arg_speed = kwargs.get('f', None)
-        self._callback = kwargs.get('callback', None)
-    
-        if not self._cmd_text == None:
-            self.parse()
-            
-    def __getattr__(self, name):
-        if name in self.__dict__:
-            return self.__dict__[name]
-        elif name.upper() == 'CMD':
-            return self.__dict__['_cmd']
-        elif name.upper() == 'X':
-            return self.__dict__['_arg_x']
-        elif name.upper() == 'Y':
-            return self.__dict__['_arg_y']
-        elif name.upper() == 'P':
-            #print(self.__dict__)
-            return Point(self.__dict__['_arg_x'], self.__dict__['_arg_y'])
-        elif name.upper() == 'CALLBACK':
-            return self.__dict__['_callback']
-        elif name.upper() == 'F':
-            return self.__dict__['_arg_speed']
-        else:
-            raise AttributeError('property "{}" not defined'.format(name))
-        
-    def check(self):
-        return True
-    
-    def tool_state(self):
-        return (True if self._cmd == 'G1' else False)
-        
-    def parse(self):
-        # <CMD> [X<val>] [Y<val>] [F<val>]
-        cmd_text = self._cmd_text
-        items = cmd_text.strip().upper().split(Command.CMD_SEP, 1)
-        if len(items) == 0:
-            # empty string
-            raise Exception('can not parse "{}", command is empty'.format(cmd_text))
-        elif len(items) == 1:
-            # no args
-            self._cmd = items[0].strip()
-        else:
-            self._cmd = items[0].strip()
-            # parse args
-            for item in items[1].strip().split(Command.CMD_SEP):
-                t = item.strip()
-                if t:
-                    pref = t[0]
-                    try:
-                        amount = float(t[1:])
-                    except Exception as e:
-                        raise Exception('can not parse "{}", argument "{}" is invalid'.format(cmd_text, t))
-                    if pref == 'X':
-                        self._arg_x = amount
-                    elif pref == 'Y':
-                        self._arg_y = amount
-                    elif pref == 'F':
-                        self._arg_speed = amount
-
-class StepperPulley:
-    def __init__(self, id, spr, microsteps): #, on_step_func):
-        
-        # stepper 
-        self._steps_per_revolution = spr
-        self._microsteps = microsteps
-        self._effective_steps = spr * microsteps
-        self._rads_per_step = (2 * pi) / self._effective_steps
-        # callback
-        self._id = id
-        #self._on_step = on_step_func
-        # internal
-        self._steps_to_move = 0
-        self._dir_to_move = 0
-        dispatcher.add_event('step')
-    
-    def get_steps(self):
-        return self._steps_to_move
-    
-    def set_rotation(self, angle):
-        # calc steps
-        self._steps_to_move = round(abs(angle) / self._rads_per_step)
-        # calc direction
-        if angle > 0:
-            self._dir_to_move = 1
-        elif angle < 0:
-            self._dir_to_move = -1
-        else:
-            self._dir_to_move = 0
-            self._steps_to_move = 0
-        #print('set rotation id={}, s={}, d={}'.format(self._id, self._steps_to_move, self._dir_to_move))
-        return self._steps_to_move
-    
-    def step(self):
-        if self._steps_to_move == 0:
-            #print('id={} no steps to move'.format(self._id))
-            pass
-        else:
-            # make one step in direction (-1 or +1)
-            self._steps_to_move -= 1
-            #if self._on_step:
-            #    self._on_step(self._id, self._rads_per_step * self._dir_to_move)
-            dispatcher.trigger_event('step', self._id, self._rads_per_step * self._dir_to_move)
-            #print('id={}, s2m={}'.format(self._id, self._steps_to_move))
-        
-        return self._steps_to_move
-        
-class PolarBot:
-    DEFAULT_SPEED = 100
-    STEPS_PER_REV = 200
-    MICROSTEP = 16
-    PULLEY_DIA_MM = 10
-    MAX_SEG_LEN_MM = 5
-    
-    def __init__(self, controler, **kwargs):
-        self._executor = []
-        #self._controler = controler
-        self.area_width = kwargs.get('width', 800)
-        self.area_height = kwargs.get('height', 600) 
-        #
-        self.mount_point = Point(self.area_width / 2, 100)
-        #
-        self.armA_len = self.area_width / 4
-        self.armB_len = self.armA_len
-        self.sqr_arm_len = self.armA_len ** 2 
-        # max tool distance
-        self.sqr_max_tool_dist = (self.armA_len + self.armB_len) ** 2
-        # angle in radians between arm A and x axis
-        self.armA_angle = pi / 2
-        self.tg_armA_angle = None
-        # angle in radians between arm B and arm A
-        self.armB_angle = 2 * pi - pi / 2
-        self.tg_armB_angle = None
-        
-        # position of robot's tool (pen)
-        self.tool_position = Point(self.mount_point.x - self.armA_len, self.mount_point.y + self.armA_len)
-        # calculated tool pos
-        self.calc_tool_position = self.tool_position.copy()
-        # target tool position
-        self.tg_tool_position = self.tool_position.copy()
-        # source tool position
-        self.sc_tool_position = self.tool_position.copy()
-        #
-        self.curent_cmd = None
-        #
-        self.tick_int = controler.get_tick_interval()
-        # create stepper pulleys and initialize events
-        print('===>>')
-        dispatcher.step = self.on_stepper_step
-        print(dispatcher.step)
-        print('<<===')
-        self.pulleyA = StepperPulley('A', PolarBot.STEPS_PER_REV, PolarBot.MICROSTEP) #, self.on_a_step)
-        self.pulleyB = StepperPulley('B', PolarBot.STEPS_PER_REV, PolarBot.MICROSTEP) #, self.on_b_step)
-        # register actions
-        controler.register_action('tick', self.on_tick)
-        #controler.register_action('move_to', self.on_move_to)
-        controler.register_action('run_cmd', self.on_run_cmd)
-        controler.register_action('clear', self.on_clear)
-        # events
-        #dispatcher.step += self.on_stepper_step
-        dispatcher.go_coordinates += self.on_move_to
-        
-    def update(self):
-        # update executioners
-        self._execute('update', (self.armA_angle, self.armB_angle))
-        
-    def add_executor(self, ex):
-        try:
-            ex.init(self.area_width, self.area_height, self.mount_point, self.armA_len)
-            self._executor.append(ex)
-        except Exception as e:
-            print(e)
-        self.update()
-        
-    def rem_executor(self, ex):
-        if ex in self._executor:
-            del(self._executor[self._executor.index(ex)])
-            
-    def load_program(self, data):
-        pass
-    
-    def _execute(self, action, args):
-        for ex in self._executor:
-            try:
-                getattr(ex, action)(*args)
-            except Exception as e:
-                print(e)
-    
-    def calc_target_angles(self):
-        #print('tp={}'.format(self.tool_position))
-        # calc distance between tool position and mount point
-        dx = self.tool_position.x - self.mount_point.x
-        dy = self.tool_position.y - self.mount_point.y
-        sqr_tool_dist = dx ** 2 + dy ** 2
-        self.tool_dist = sqrt(sqr_tool_dist)
-        #print('dx,dy = {}'.format((dx, dy)))
-        #print('tool dist = {}'.format(self.tool_dist))
-        # calc armB_angle
-        cos_beta = (self.sqr_arm_len + self.sqr_arm_len - sqr_tool_dist) / (2 * self.sqr_arm_len)
-        #print('cos beta = {}'.format(cos_beta))
-        beta = acos(cos_beta)
-        self.tg_armB_angle = 2 * pi - beta
-        # calc armA_angle
-        # calc other two angles in isosceles triangle
-        base_angle = (pi - beta) / 2
-        # calc straight angle of tool path line
-        alpha = acos(abs(self.tool_position.x - self.mount_point.x) / self.tool_dist)
-        if self.tool_position.x <= self.mount_point.x:
-            self.tg_armA_angle = pi - (alpha + base_angle)
-        else:
-            self.tg_armA_angle = alpha - base_angle
-            
-    def actuate_pos(self):
-        self.calc_target_angles()
-        # deltas
-        da = self.tg_armA_angle - self.armA_angle
-        db = self.tg_armB_angle - self.armB_angle
-        #print('tgab={}, ab={}'.format((round(self.tg_armA_angle, 5), round(self.tg_armB_angle, 5)),(round(self.armA_angle, 5), round(self.armB_angle, 5))))
-        #
-        stepsA = self.pulleyA.set_rotation(da)
-        stepsB = self.pulleyB.set_rotation(db)
-        # set master and slave pulleys
-        self.master_pulley = self.pulleyA if stepsA >= stepsB else self.pulleyB
-        self.slave_pulley = self.pulleyA if stepsA < stepsB else self.pulleyB
-        # error
-        self.error = self.master_pulley.get_steps() / 2
-        #print('act pos cmd={}'.format(self.curent_cmd))
-        
-    def check_bounds(self, x, y):
-        return ((x - self.mount_point.x) ** 2 + (y - self.mount_point.y) ** 2 <= self.sqr_max_tool_dist)
-    
-    def move_to(self, x, y):
-        if not self.check_bounds(x, y):
-            print('move fail: out of bounds')
-        self.tool_position.x = x
-        self.tool_position.y = y
-        self.calc_target_angles()
-        self.armA_angle, self.armB_angle = self.tg_armA_angle, self.tg_armB_angle
-        self.update()
-        
-    def run_cmd(self, cmd):
-        self.curent_cmd = cmd
-        #print('run_cmd={}'.format(self.curent_cmd.p.xy))
-        if not self.check_bounds(*self.curent_cmd.p.xy):
-            print('cmd fail: out of bounds')
-            cb = self.curent_cmd.callback
-            del(self.curent_cmd)
-            self.curent_cmd = None
-            if cb:
-                cb(False)
-            return
-        self.sc_tool_position.set(*self.tool_position.xy)
-        self.tg_tool_position.set(*cmd.p.xy)
-        dx = self.tg_tool_position.x - self.tool_position.x
-        dy = self.tg_tool_position.y - self.tool_position.y
-        # total distance to move
-        move_dist = sqrt(dx ** 2 + dy ** 2)
-        # number of segmets
-        self.seg_count = 1
-        max_d = max(abs(dx), abs(dy))
-        while max_d / self.seg_count > PolarBot.MAX_SEG_LEN_MM:
-            self.seg_count += 1
-        self.dx = dx / self.seg_count
-        self.dy = dy / self.seg_count
-        #print('sg={}, dx,dy={}'.format(self.seg_count, (self.dx, self.dy)))
-        # set tool of executors
-        self._execute('set_tool', (cmd.tool_state(),))
-        # run first segment
-        self.tool_position.x += self.dx
-        self.tool_position.y += self.dy
-        self.actuate_pos()
-        
-    # EVENTS
-    def on_stepper_step(self, id, angle):
-        if id == 'A':
-            self.armA_angle += angle
-        else:
-            self.armB_angle += angle
-        
-    # def on_a_step(self, id, angle):
-        # self.armA_angle += angle
-        # #self.update()
-        
-    # def on_b_step(self, id, angle):
-        # self.armB_angle += angle
-        # #self.update()
-        
-    def on_tick(self):
-        #print(self.curent_cmd)
-        if self.curent_cmd:
-            # step master pulley
-            #print('tick')
-            rem_master_steps = self.master_pulley.step()
-            self.error -= self.slave_pulley.get_steps()
-            if self.error < 0:
-                rem_slave_steps = self.slave_pulley.step()
-                self.error += self.master_pulley.get_steps()
-                #print('ss={}'.format(rem_slave_steps))
-            #print('ms={}'.format(rem_master_steps))
-            self.update()
-            if rem_master_steps == 0:
-                self.seg_count -= 1
-                #print('seg left={}'.format(self.seg_count))
-                if self.seg_count > 0:
-                    self.tool_position.x += self.dx
-                    self.tool_position.y += self.dy
-                    self.actuate_pos()
-                else:
-                    # all done
-                    #print('on_tick@done')
-                    cb = self.curent_cmd.callback
-                    del(self.curent_cmd)
-                    self.curent_cmd = None
-                    if cb:
-                        cb(True)
-            
-    def on_move_to(self, x, y, callback):
-        #print('move_to({},{})'.format(x, y))
-        self.run_cmd(Command(cmd = 'G1', x = x, y = y, callback = callback))
-        #self.move_to(x, y)
-    
-    def on_run_cmd(self, text, callback):
-        #print('run_cmd({})'.format(text))
-        self.run_cmd(Command(cmd_text = text, callback = callback))
-    
-    def on_clear(self):
-        self._execute('clear', ())
-        self._execute('update', (self.armA_angle, self.armB_angle, True))
-    
-class Visualiser(TK.Canvas):
+from tkinter.filedialog import askopenfilename
+from math import floor
+from time import sleep, perf_counter
+from functools import partial
+from collections import deque
+from event_dispatcher import EventDispatcher
+from metrics import Metrics
+from line_profile import LineProfile
+from executor import Executor
+from path_index import PathIndex
+from preflight import summary_lines
+from checkpoint import CheckpointLog, program_id
+from program_file import ProgramFile
+# core is re-exported for code written against this module
+from polarbot import core
+from polarbot.core import WIDTH, HEIGHT, Point, Command, StepperPulley, PolarBot, forward_kinematics
+from polarbot.view import ViewState
+
+class Visualiser(TK.Canvas, ViewState, Executor):
     GRID_STEP = 100
-    def __init__(self, parent, width, height):
+    # max number of grid crosses, grid step is doubled when zoomed out
+    MAX_GRID_CROSSES = 400
+    # zoom factor of one mouse wheel notch
+    ZOOM_STEP = 1.25
+    # simplification tolerance of tool path in pixels
+    LOD_PIXELS = 0.5
+    # tool path items drawn per step before they are merged into indexed chunks
+    MAX_LIVE_ITEMS = 2000
+    # stats overlay modes
+    # tool position and angles redrawn on every update
+    STATS_POSE = 'pose'
+    # tool position and metrics redrawn every STATS_INTERVAL ms
+    STATS_METRICS = 'metrics'
+    STATS_INTERVAL = 250
+    def __init__(self, parent, width, height, dispatcher = None, rads_per_step = None):
         self.tag = 'draws'
         self.stats_tag = 'stats'
         self.path_tag = 'tool_path'
+        # items of path drawn since the last flush and of the open chunk, replaced on flush
+        self.live_tag = 'live_path'
         self.grid_tag = 'grid'
         
         super().__init__(parent) #, width = self.canvas_width, height = self.canvas_height)
+        # view transform, forward kinematics and tool path, see polarbot/view.py
+        ViewState.__init__(self, width, height, rads_per_step)
         self.parent = parent
-        self.width = width
-        self.height = height
-        self.bot_width = width
-        self.bot_height = height
-        self.x_scale = 1.0
-        self.y_scale = 1.0
-        
-        self._last_tool_p = Point(0.0, 0.0)
-        self._enable_tool = False
+        self._pan_start = None
+        self._live_items = 0
+        # sealed chunks up to this index have items or are out of view
+        self._drawn_chunks = 0
+        # stats overlay
+        self.stats_mode = Visualiser.STATS_POSE
+        self.metrics = None
+        self._stats_job = None
         
         self.configure(width = self.width, height = self.height, background = "white", borderwidth = 0)
         #
         self.bind('<Button-1>', self.on_click)
-        print(dispatcher)
-        print(type(dispatcher))
-        dispatcher.add_event('on_click')
+        # zoom with mouse wheel, pan with right button, reset view with middle button
+        self.bind('<MouseWheel>', self.on_wheel)
+        self.bind('<Button-4>', self.on_wheel)
+        self.bind('<Button-5>', self.on_wheel)
+        self.bind('<Button-3>', self.on_pan_start)
+        self.bind('<B3-Motion>', self.on_pan_move)
+        self.bind('<Button-2>', self.on_reset_view)
+        # clicks are delivered ahead of other queued events
+        self.dispatcher = dispatcher or EventDispatcher.default()
+        self.dispatcher.add_event('on_click', priority = 1)
 
     def init(self, width, height, mount_point, arm_len):
         # called by controler when object of this class added to controler's executioners list
-        self.bot_width = width
-        self.bot_height = height
-        self.bot_mount_point = mount_point
-        # distance
-        self.bot_armA_len = arm_len
-        self.bot_armB_len = arm_len
-        # scale
-        self.x_scale = self.width / self.bot_width
-        self.y_scale = self.height / self.bot_height
-        #print(self.scale_x , self.scale_y)
-        # draw grid
-        x = 0
-        while x < self.width:
-            y = 0
-            while y < self.height:
-                self.cross(x, y, 15, fill='gray', tag = self.grid_tag)
-                y += Visualiser.GRID_STEP
-            x += Visualiser.GRID_STEP
+        self.set_geometry(width, height, mount_point, arm_len)
+        self.draw_grid()
 
+    def draw_grid(self):
+        # crosses in world coordinates, only the visible ones
+        self.delete(self.grid_tag)
+        xmin, ymin, xmax, ymax = self.visible_area()
+        step = Visualiser.GRID_STEP
+        while ((xmax - xmin) / step + 1) * ((ymax - ymin) / step + 1) > Visualiser.MAX_GRID_CROSSES:
+            step *= 2
+        x = floor(xmin / step) * step
+        while x <= xmax:
+            y = floor(ymin / step) * step
+            while y <= ymax:
+                self.cross(self.scale_x(x), self.scale_y(y), 15, fill='gray', tag = self.grid_tag)
+                y += step
+            x += step
     
     def line(self, x0, y0, x1, y1, **kwargs):
         #print('({},{})-({},{})'.format(x0, y0, x1, y1))
@@ -451,86 +114,298 @@ class Visualiser(TK.Canvas):
         kwargs['text'] = text 
         self.create_text(x, y, kwargs)
         
-    def scale_x(self, v):
-        return round(v * self.x_scale)
-        
-    def scale_y(self, v):
-        return round(v * self.y_scale)
-    
     def update(self, angleA, angleB, force_redraw = False):
-        #print('update')
-        signa = 1 if angleA >= 0 else -1
-        # calc point of junction armA and armB
-        dx1 = self.bot_armA_len * cos(angleA)
-        dy1 = sqrt(self.bot_armA_len ** 2 - dx1 ** 2) * signa
-        x1 = self.bot_mount_point.x + dx1 
-        y1 = self.bot_mount_point.y + dy1
-        # calc tool position
-        if angleA >=0:
-            beta = pi - (2 * pi - angleB) - (pi - abs(angleA) - pi / 2)
-        else:
-            beta = pi - (2 * pi - angleB) - abs(angleA) - pi / 2
-        signbeta = 1 if beta >= 0 else -1
-        #print('beta={}'.format(beta))
-        dy2 = self.bot_armB_len * cos(beta)
-        dx2 = sqrt(self.bot_armB_len ** 2 - dy2 ** 2)
-        f_tx = x1 - (dx2 * signbeta)
-        f_ty = y1 + dy2
-        # tool coord in scale
-        tool_x = self.scale_x(f_tx)
-        tool_y = self.scale_y(f_ty)
-        # update stats
-        self.delete(self.stats_tag)
-        self.text(self.width // 2, 10, 'tool x,y={}'.format((f_tx, f_ty)))
-        self.text(self.width // 2, 20, 'x1,y1={}'.format((x1, y1)))
-        self.text(self.width // 2, 30, 'a,b={}'.format((round(angleA, 5), round(angleB, 5))))
+        last_x, last_y = self._last_tool_p.xy
+        x1, y1, tool_x, tool_y, moved = self.update_pose(angleA, angleB, force_redraw)
+        # update stats, text is formatted once when Tk is idle
+        if self.stats_mode == Visualiser.STATS_POSE and self._stats_job is None:
+            self._stats_job = self.after_idle(self.refresh_stats)
         
-        if tool_x != self._last_tool_p.x or tool_y != self._last_tool_p.y or force_redraw:
+        if moved:
             # redraw
             self.delete(self.tag)
             # aim
             #self.rect(tool_x - 1, tool_y - 1, tool_x + 1, tool_y + 1, outline = 'blue')
             self.cross(tool_x, tool_y, fill = 'blue')
             # armA
-            self.line(self.scale_x(self.bot_mount_point.x), self.scale_x(self.bot_mount_point.y), self.scale_x(x1), self.scale_y(y1), fill = 'red')
+            self.line(self.scale_x(self.bot_mount_point.x), self.scale_y(self.bot_mount_point.y), self.scale_x(x1), self.scale_y(y1), fill = 'red')
             # armB
             self.line(self.scale_x(x1), self.scale_y(y1), tool_x, tool_y, fill = 'red')
         
             # draw tool path
             if self._enable_tool:
-                self.create_line(self._last_tool_p.x, self._last_tool_p.y, tool_x, tool_y, fill = 'gray')#, tag = self.path_tag)
-            self._last_tool_p.set(tool_x, tool_y) 
+                self.create_line(last_x, last_y, tool_x, tool_y, fill = 'gray', tag = (self.path_tag, self.live_tag))
+                self._live_items += 1
+                if self._live_items > Visualiser.MAX_LIVE_ITEMS:
+                    self.flush_path()
+
+    def redraw_path(self):
+        # replace tool path items by visible chunks of indexed path, one item per chunk, after zoom or pan
+        self.delete(self.path_tag)
+        self._live_items = 0
+        level = self.path_level()
+        for chunk in self.path_index.query(*self.visible_area()):
+            self.draw_chunk(chunk, level)
+        self._drawn_chunks = len(self.path_index.chunks)
+
+    def flush_path(self):
+        # replace items drawn step by step by chunks sealed since the last flush and the open chunk,
+        # items of chunks drawn before stay
+        self.delete(self.live_tag)
+        self._live_items = 0
+        level = self.path_level()
+        xmin, ymin, xmax, ymax = self.visible_area()
+        chunks = self.path_index.chunks
+        for i in range(self._drawn_chunks, len(chunks)):
+            bbox = chunks[i].bbox
+            if bbox[0] <= xmax and bbox[2] >= xmin and bbox[1] <= ymax and bbox[3] >= ymin:
+                self.draw_chunk(chunks[i], level)
+        self._drawn_chunks = len(chunks)
+        if self.path_index.open_chunk is not None:
+            self.draw_chunk(self.path_index.open_chunk, level)
+
+    def path_level(self):
+        return PathIndex.lod_level(Visualiser.LOD_PIXELS / (self.x_scale * self.zoom))
+
+    def draw_chunk(self, chunk, level):
+        # open chunk still grows, its item is replaced on the next flush
+        points = chunk.simplified(level)
+        if len(points) < 4:
+            return
+        coords = []
+        for i in range(0, len(points), 2):
+            coords.append(self.scale_x(points[i]))
+            coords.append(self.scale_y(points[i + 1]))
+        self.create_line(*coords, fill = 'gray', tag = self.path_tag if chunk.sealed else (self.path_tag, self.live_tag))
+
+    def redraw_view(self):
+        """ redraw grid, tool path and bot after zoom or pan """
+        self.draw_grid()
+        self.redraw_path()
+        self.tag_lower(self.path_tag)
+        self.tag_lower(self.grid_tag)
+        if self._pose is not None:
+            f_tx, f_ty, x1, y1, angleA, angleB = self._pose
+            self._last_tool_p.set(self.scale_x(f_tx), self.scale_y(f_ty))
+            self.update(angleA, angleB, True)
+
+    def set_view(self, zoom, view_x, view_y):
+        self.zoom = zoom
+        self.view_x = view_x
+        self.view_y = view_y
+        self.redraw_view()
+
+    def zoom_at(self, x, y, factor):
+        """ zoom keeping world point under screen point x, y in place """
+        wx, wy = self.world_x(x), self.world_y(y)
+        zoom = self.zoom * factor
+        self.set_view(zoom, wx - x / (self.x_scale * zoom), wy - y / (self.y_scale * zoom))
     
+    def pose_lines(self):
+        if self._pose is None:
+            return []
+        f_tx, f_ty, x1, y1, angleA, angleB = self._pose
+        return ['tool x,y={}'.format((f_tx, f_ty)),
+                'x1,y1={}'.format((x1, y1)),
+                'a,b={}'.format((round(angleA, 5), round(angleB, 5)))]
+
+    def draw_stats(self, lines):
+        for i, line in enumerate(lines):
+            self.text(self.width // 2, 10 * (i + 1), line)
+
+    def set_stats_mode(self, mode, metrics = None):
+        """ switch stats overlay: STATS_POSE, STATS_METRICS or None to hide it """
+        self.stats_mode = mode
+        if metrics is not None:
+            self.metrics = metrics
+        if self._stats_job is not None:
+            self.after_cancel(self._stats_job)
+            self._stats_job = None
+        self.delete(self.stats_tag)
+        if mode is not None:
+            self.refresh_stats()
+
+    def refresh_stats(self):
+        # redraw of stats overlay, metrics overlay is redrawn periodically
+        self._stats_job = None
+        self.delete(self.stats_tag)
+        lines = self.pose_lines()
+        if self.stats_mode == Visualiser.STATS_METRICS:
+            if self.metrics is not None:
+                lines += self.metrics.summary_lines() if self.metrics.enabled else ['metrics disabled']
+            self._stats_job = self.after(Visualiser.STATS_INTERVAL, self.refresh_stats)
+        self.draw_stats(lines)
+
     def clear(self):
         #self.delete(self.path_tag)
         print('clear')
         self.delete(*self.find_all())
+        self.path_index.clear()
+        self._live_items = 0
+        self._drawn_chunks = 0
+        self.draw_grid()
         
-    def set_tool(self, state = True):
-        self._enable_tool = state
-
     def on_click(self, event):
         print(event)
-        dispatcher.trigger_event('on_click', x = event.x, y = event.y)
+        # click position in bot coordinates
+        self.dispatcher.emit('on_click', x = self.world_x(event.x), y = self.world_y(event.y), time = perf_counter())
+
+    def on_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.zoom_at(event.x, event.y, Visualiser.ZOOM_STEP)
+        elif event.num == 5 or event.delta < 0:
+            self.zoom_at(event.x, event.y, 1 / Visualiser.ZOOM_STEP)
+
+    def on_pan_start(self, event):
+        self._pan_start = (event.x, event.y, self.view_x, self.view_y)
+
+    def on_pan_move(self, event):
+        if self._pan_start is None:
+            return
+        x, y, view_x, view_y = self._pan_start
+        self.set_view(self.zoom, view_x - (event.x - x) / (self.x_scale * self.zoom), view_y - (event.y - y) / (self.y_scale * self.zoom))
+
+    def on_reset_view(self, event):
+        self.set_view(1.0, 0.0, 0.0)
+
+class ProgramView(TK.Frame):
+    """ read only view of ProgramFile, only visible lines are in the text widget """
+    ROWS = 24
+    # lines scrolled by one mouse wheel notch
+    WHEEL_LINES = 3
+    # followed line is kept this many lines below the top
+    FOLLOW_MARGIN = 3
+    def __init__(self, parent, width = 20, rows = ROWS):
+        super().__init__(parent)
+        self.rows = rows
+        self.program = None
+        # first visible line and line of running command, 1 based
+        self.first = 1
+        self.current = None
+        # view scrolls to running line
+        self.follow = True
+        self.txt = TK.Text(self, width = width, height = rows, wrap = TK.NONE, state = TK.DISABLED)
+        self.txt.grid(row = 0, column = 0, sticky = TK.W + TK.E + TK.N + TK.S)
+        self.txt.tag_configure('current', background = 'yellow')
+        self.scroll = TK.Scrollbar(self, command = self.on_scroll)
+        self.scroll.grid(row = 0, column = 1, sticky = TK.N + TK.S)
+        self.columnconfigure(0, weight = 1)
+        self.rowconfigure(0, weight = 1)
+        self.txt.bind('<MouseWheel>', self.on_wheel)
+        self.txt.bind('<Button-4>', self.on_wheel)
+        self.txt.bind('<Button-5>', self.on_wheel)
+
+    def set_program(self, program):
+        self.program = program
+        self.first = 1
+        self.current = None
+        self.render()
+
+    def line_count(self):
+        return len(self.program) if self.program is not None else 0
+
+    def scroll_to(self, first):
+        first = max(1, min(first, self.line_count() - self.rows + 1))
+        if first != self.first:
+            self.first = first
+            self.render()
+
+    def render(self):
+        # text of visible lines only, prefixed with line numbers
+        last = min(self.first + self.rows - 1, self.line_count())
+        self.txt.configure(state = TK.NORMAL)
+        self.txt.delete(1.0, TK.END)
+        if last >= self.first:
+            self.txt.insert(1.0, '\n'.join('{:>7} {}'.format(n, self.program.line(n)) for n in range(self.first, last + 1)))
+        self.txt.configure(state = TK.DISABLED)
+        self.mark_current()
+        count = self.line_count()
+        if count:
+            self.scroll.set((self.first - 1) / count, last / count)
+        else:
+            self.scroll.set(0.0, 1.0)
+
+    def mark_current(self):
+        self.txt.tag_remove('current', 1.0, TK.END)
+        if self.current is not None and self.first <= self.current < self.first + self.rows:
+            row = self.current - self.first + 1
+            self.txt.tag_add('current', '{}.0'.format(row), '{}.0'.format(row + 1))
+
+    def set_current(self, line):
+        """ highlight line of running command, None to remove highlight """
+        if line == self.current:
+            return
+        self.current = line
+        if line is not None and self.follow and not self.first <= line < self.first + self.rows:
+            self.scroll_to(line - ProgramView.FOLLOW_MARGIN)
+        self.mark_current()
+
+    def on_scroll(self, *args):
+        if args[0] == 'moveto':
+            self.scroll_to(round(float(args[1]) * self.line_count()) + 1)
+        elif args[0] == 'scroll':
+            amount = int(args[1]) * (self.rows if args[2] == 'pages' else 1)
+            self.scroll_to(self.first + amount)
+
+    def on_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.scroll_to(self.first - ProgramView.WHEEL_LINES)
+        elif event.num == 5 or event.delta < 0:
+            self.scroll_to(self.first + ProgramView.WHEEL_LINES)
+        return 'break'
 
 class ControlPanel(TK.Frame):
-    ACTIONS = ('TICK', 'MOVE_TO', 'RUN_CMD', 'CLEAR')
-    TICK_INTERVAL = 10
+    ACTIONS = core.ACTIONS
+    TICK_INTERVAL = core.TICK_INTERVAL
+    # max number of missed ticks executed in a burst when tick fired late
+    MAX_CATCHUP_TICKS = 10
+    LOOKAHEAD = core.LOOKAHEAD
+    METRICS_FILE = 'metrics.json'
+    # hot lines and annotated program of the last run, see line_profile.py
+    PROFILE_FILE = 'profile.txt'
+    # state of bot is saved to CHECKPOINT_FILE, see checkpoint.py
+    CHECKPOINT_FILE = 'checkpoints.jsonl'
+    CHECKPOINT_LINES = core.CHECKPOINT_LINES
+    # estimate is refreshed this many ms after the last edit of program
+    PREVIEW_DELAY = 300
+    # pasted text longer than this goes to a file shown in program view instead of the text field
+    LARGE_PASTE = 256 * 1024
     
     def __init__(self, parent, **kwargs):
         super().__init__(parent) #, width = self.canvas_width, height = self.canvas_height)
         self.parent = parent
         self._actions = {}
         self.tick_interval = kwargs.get('tick_interval', ControlPanel.TICK_INTERVAL)
+        self.dispatcher = kwargs.get('dispatcher') or EventDispatcher.default()
+        # stage counters and timings, disabled until switched on
+        self.metrics = kwargs.get('metrics') or Metrics()
+        # costs of program lines, disabled until switched on
+        self.profile = kwargs.get('profile') or LineProfile()
+        # tick scheduling: time when next tick is due and catch-up cap
+        self.max_catchup = kwargs.get('max_catchup', ControlPanel.MAX_CATCHUP_TICKS)
+        self.lookahead = kwargs.get('lookahead', ControlPanel.LOOKAHEAD)
+        self.checkpoint_file = kwargs.get('checkpoint_file', ControlPanel.CHECKPOINT_FILE)
+        self.checkpoint_lines = kwargs.get('checkpoint_lines', ControlPanel.CHECKPOINT_LINES)
+        self.checkpoints = None
+        self._next_checkpoint = 0
+        self._preview_job = None
+        self._tick_due = None
         # self.width = width
         # self.height = height
         #self.configure(width = self.width, height = self.height)
         #self.pack() #ipadx = 10, ipady = 10) 
         #
         self.script_running = False
-        self.cmd_running = False
+        self.cmds_in_flight = 0
         self.program_line = 0
         self.program_text_iter = None
+        self.program_lines = []
+        # program in memory mapped file shown in program view instead of the text field
+        self.program_file = None
+        # lines of commands sent to bot and not done yet, the first one is running
+        self._lines_in_flight = deque()
+        # line of the last command called back
+        self._line_done = 0
         # create controls
         self.lb_x = TK.Label(self, text = 'GO TO X')
         self.lb_x.grid(row = 0, column = 0)
@@ -542,21 +417,69 @@ class ControlPanel(TK.Frame):
         self.ed_y.grid(row = 0, column = 3)
         # text fields
         self.txt_prog = TK.Text(self, width = 20)
-        self.txt_prog.grid(columnspan = 4, sticky = TK.W + TK.E + TK.N + TK.S)
+        self.txt_prog.grid(row = 1, columnspan = 4, sticky = TK.W + TK.E + TK.N + TK.S)
         # button - run
         self.btn_run = TK.Button(self, text = 'RUN')
         self.btn_run.grid(columnspan = 4, sticky = TK.W + TK.E + TK.N + TK.S)
         # button clear
         self.btn_clear = TK.Button(self, text = 'CLEAR')
         self.btn_clear.grid(columnspan = 4, sticky = TK.W + TK.E + TK.N + TK.S)
+        # metrics switch and dump
+        self.metrics_enabled = TK.BooleanVar(self, value = self.metrics.enabled)
+        self.chk_metrics = TK.Checkbutton(self, text = 'METRICS', variable = self.metrics_enabled, command = self.chkMetrics_on_click)
+        self.chk_metrics.grid(columnspan = 2, row = 4, column = 0, sticky = TK.W)
+        self.btn_dump = TK.Button(self, text = 'DUMP')
+        self.btn_dump.grid(columnspan = 2, row = 4, column = 2, sticky = TK.W + TK.E)
+        # preflight estimate of program
+        self.btn_estimate = TK.Button(self, text = 'ESTIMATE')
+        self.btn_estimate.grid(columnspan = 4, row = 5, column = 0, sticky = TK.W + TK.E + TK.N + TK.S)
+        self.lb_estimate = TK.Label(self, justify = TK.LEFT, anchor = TK.W)
+        self.lb_estimate.grid(columnspan = 4, row = 6, column = 0, sticky = TK.W + TK.E)
+        # resume program from line
+        self.lb_line = TK.Label(self, text = 'FROM LINE')
+        self.lb_line.grid(columnspan = 2, row = 7, column = 0)
+        self.ed_line = TK.Entry(self, width = 8)
+        self.ed_line.grid(row = 7, column = 2)
+        self.btn_resume = TK.Button(self, text = 'RESUME')
+        self.btn_resume.grid(row = 7, column = 3, sticky = TK.W + TK.E)
+        # preemption of running commands, clicks on visualiser jog the bot when program is paused or not running
+        self.btn_pause = TK.Button(self, text = 'PAUSE')
+        self.btn_pause.grid(columnspan = 2, row = 8, column = 0, sticky = TK.W + TK.E)
+        self.btn_abort = TK.Button(self, text = 'ABORT')
+        self.btn_abort.grid(columnspan = 2, row = 8, column = 2, sticky = TK.W + TK.E)
+        self.paused = False
+        # costs of program lines and report of them
+        self.profile_enabled = TK.BooleanVar(self, value = self.profile.enabled)
+        self.chk_profile = TK.Checkbutton(self, text = 'PROFILE', variable = self.profile_enabled, command = self.chkProfile_on_click)
+        self.chk_profile.grid(columnspan = 2, row = 9, column = 0, sticky = TK.W)
+        self.btn_report = TK.Button(self, text = 'REPORT')
+        self.btn_report.grid(columnspan = 2, row = 9, column = 2, sticky = TK.W + TK.E)
+        # large programs are opened from file into program view, EDIT goes back to the text field
+        self.btn_open = TK.Button(self, text = 'OPEN')
+        self.btn_open.grid(columnspan = 2, row = 10, column = 0, sticky = TK.W + TK.E)
+        self.btn_edit = TK.Button(self, text = 'EDIT')
+        self.btn_edit.grid(columnspan = 2, row = 10, column = 2, sticky = TK.W + TK.E)
+        self.program_view = ProgramView(self)
+        self.program_view.grid(row = 1, columnspan = 4, sticky = TK.W + TK.E + TK.N + TK.S)
+        self.program_view.grid_remove()
         # bindings
         self.ed_y.bind('<Key>', self.edXY_on_key_enter)
         self.ed_x.bind('<Key>', self.edXY_on_key_enter)
         self.btn_run.bind('<Button-1>', self.btnRun_on_click)
         self.btn_clear.bind('<Button-1>', self.btnClear_on_click)
+        self.btn_dump.bind('<Button-1>', self.btnDump_on_click)
+        self.btn_estimate.bind('<Button-1>', self.btnEstimate_on_click)
+        self.btn_resume.bind('<Button-1>', self.btnResume_on_click)
+        self.btn_pause.bind('<Button-1>', self.btnPause_on_click)
+        self.btn_abort.bind('<Button-1>', self.btnAbort_on_click)
+        self.btn_report.bind('<Button-1>', self.btnReport_on_click)
+        self.btn_open.bind('<Button-1>', self.btnOpen_on_click)
+        self.btn_edit.bind('<Button-1>', self.btnEdit_on_click)
+        self.txt_prog.bind('<<Paste>>', self.txtProg_on_paste)
+        self.txt_prog.bind('<<Modified>>', self.txtProg_on_modified)
         # events
-        dispatcher.add_event('go_coordinates')
-        dispatcher.on_click += self.on_mouse1_click
+        self.dispatcher.add_event('go_coordinates')
+        self.dispatcher.subscribe('on_click', self.on_mouse1_click)
         # start ticking
         self.after(self.tick_interval, self.tick)
 
@@ -583,22 +506,74 @@ class ControlPanel(TK.Frame):
         self.program_line += 1
         try:
             text = next(self.program_text_iter)
-            if text:
-                print('cmd #{} {}'.format(self.program_line, text))
-                self.cmd_running = True
-                self.raise_action('RUN_CMD', text, self.on_cmd_done)
         except StopIteration as e:
             self.program_line = 0
             self.script_running = False
+            return
+        if text.strip():
+            line = self.program_line
+            print('cmd #{} {}'.format(line, text))
+            try:
+                self.raise_action('RUN_CMD', text, partial(self.on_cmd_done, line), line)
+            except Exception as e:
+                # line which can not be planned is reported and skipped, program goes on
+                print('cmd #{} error={}'.format(line, e))
+                return
+            self.cmds_in_flight += 1
+            # callback may come before RUN_CMD returns, then the line is already done
+            if line > self._line_done:
+                self._lines_in_flight.append(line)
+                if len(self._lines_in_flight) == 1:
+                    # bot is idle, command starts at once
+                    self.program_view.set_current(line)
             
     def tick(self):
-        #print('--> tick()')
-        if self.script_running and not self.cmd_running:
+        metrics = self.metrics
+        interval = self.tick_interval / 1000
+        now = perf_counter()
+        if self._tick_due is None:
+            self._tick_due = now
+        # how much later than scheduled the tick fired
+        lateness = max(0.0, now - self._tick_due)
+        # ticks missed while gui was busy are executed now, up to max_catchup
+        missed = int(lateness / interval)
+        burst = min(missed, self.max_catchup)
+        # keep schedule aligned to tick interval, dropped ticks are not made up later
+        self._tick_due += (missed + 1) * interval
+        if metrics.enabled:
+            metrics.count('ticks')
+            metrics.timing('tick_lateness', lateness)
+            if burst:
+                metrics.count('ticks_caught_up', burst)
+            if missed > burst:
+                metrics.count('ticks_dropped', missed - burst)
+        try:
+            for i in range(1 + burst):
+                self.tick_once()
+        finally:
+            # next tick is scheduled even when a handler raised, gui keeps ticking
+            self.after(max(0, round((self._tick_due - perf_counter()) * 1000)), self.tick)
+        work = perf_counter() - now
+        if metrics.enabled:
+            metrics.timing('tick', work)
+            if work > interval:
+                # tick work took longer than tick interval
+                metrics.count('tick_overruns')
+
+    def tick_once(self):
+        # one tick of work: events, next command and bot step
+        # input queued since the last tick is handled before the bot steps, so a click preempts within one tick
+        if self.metrics.enabled:
+            self.metrics.gauge('queue_depth', self.dispatcher.queue_size())
+            t = perf_counter()
+            self.dispatcher.dispatch()
+            self.metrics.timing('dispatch', perf_counter() - t)
+        else:
+            self.dispatcher.dispatch()
+        # commands are sent ahead, bot plans them while the running one is stepping
+        while self.script_running and self.cmds_in_flight < self.lookahead:
             self.next_cmd()
         self.raise_action('TICK')
-        self.after(self.tick_interval, self.tick)
-        dispatcher.dispatch()
-        #print('<-- tick()')
 
     def edXY_on_key_enter(self, event):
         #print(event)
@@ -611,27 +586,201 @@ class ControlPanel(TK.Frame):
                 showerror(message = 'invalid symbols in edit fields for X and Y')
                 return
             #self.raise_action('MOVE_TO', x, y, self.on_move_done)
-            dispatcher.trigger_event('go_coordinates', x, y, self.on_move_done)
+            self.dispatcher.emit('go_coordinates', x, y, self.on_move_done)
             
     def btnRun_on_click(self, event):
-        self.program_text_iter = iter(self.txt_prog.get(1.0, TK.END).split('\n'))
+        if self.program_file is not None:
+            # lines are read from the file as commands are sent
+            self.program_lines = self.program_file
+            self.program_text_iter = self.program_file.iter_from(1)
+            program = self.program_file.id
+        else:
+            text = self.txt_prog.get(1.0, TK.END)
+            self.program_lines = text.split('\n')
+            self.program_text_iter = iter(self.program_lines)
+            program = program_id(text)
         self.program_line = 0
+        self._lines_in_flight.clear()
+        self._line_done = 0
+        self.profile.reset()
+        self.checkpoints = CheckpointLog(self.checkpoint_file, program, truncate = True)
+        self._next_checkpoint = self.checkpoint_lines
         #self.next_cmd()
         self.script_running = True
+
+    def btnResume_on_click(self, event):
+        # continue program from line, state before the line is taken from checkpoints of the last run
+        try:
+            line = int(self.ed_line.get())
+        except Exception as e:
+            showerror(message = 'invalid line number')
+            return
+        if self.script_running or self.cmds_in_flight:
+            showwarning(message = 'program is running')
+            return
+        if self.program_file is not None:
+            lines = self.program_lines = self.program_file
+            self.checkpoints = CheckpointLog(self.checkpoint_file, self.program_file.id)
+            self.raise_action('SEEK', lines, line, self.checkpoints.last(line))
+            self.program_text_iter = self.program_file.iter_from(line)
+        else:
+            text = self.txt_prog.get(1.0, TK.END)
+            lines = self.program_lines = text.split('\n')
+            self.checkpoints = CheckpointLog(self.checkpoint_file, program_id(text))
+            self.raise_action('SEEK', lines, line, self.checkpoints.last(line))
+            self.program_text_iter = iter(lines[line - 1:])
+        self._lines_in_flight.clear()
+        self._line_done = 0
+        self.program_line = line - 1
+        self._next_checkpoint = line - 1 + self.checkpoint_lines
+        self.script_running = True
         
+    def btnPause_on_click(self, event):
+        if self.paused:
+            self.resume()
+        else:
+            self.pause(perf_counter())
+
+    def btnAbort_on_click(self, event):
+        self.abort(perf_counter())
+
+    def pause(self, requested = None):
+        # bot stops before the next tick, requested is perf_counter() time of user input
+        self.paused = True
+        self.btn_pause.configure(text = 'RESUME')
+        self.raise_action('PAUSE', requested)
+
+    def resume(self):
+        self.paused = False
+        self.btn_pause.configure(text = 'PAUSE')
+        self.raise_action('RESUME')
+
+    def abort(self, requested = None):
+        # program stops at the current step, commands sent ahead and queued moves are dropped
+        self.script_running = False
+        self.program_text_iter = None
+        self.dispatcher.discard('go_coordinates')
+        self.paused = False
+        self.btn_pause.configure(text = 'PAUSE')
+        self.raise_action('ABORT', requested)
+
+    def jog(self, x, y, requested = None):
+        # pen up move to x, y instead of anything running
+        self.abort(requested)
+        self.raise_action('JOG', x, y, self.on_move_done, requested)
+
     def btnClear_on_click(self, event):
         self.raise_action('CLEAR')
+
+    def chkMetrics_on_click(self):
+        self.metrics.enabled = self.metrics_enabled.get()
+
+    def btnDump_on_click(self, event):
+        self.metrics.dump(ControlPanel.METRICS_FILE)
+        print('metrics saved to {}'.format(ControlPanel.METRICS_FILE))
+
+    def chkProfile_on_click(self):
+        self.profile.enabled = self.profile_enabled.get()
+
+    def btnReport_on_click(self, event):
+        with open(ControlPanel.PROFILE_FILE, 'w') as f:
+            f.write('\n'.join(self.profile.report_lines(self.program_lines)) + '\n\n')
+            f.write('\n'.join(self.profile.annotate(self.program_lines)) + '\n')
+        print('profile saved to {}'.format(ControlPanel.PROFILE_FILE))
+
+    def btnEstimate_on_click(self, event):
+        self.raise_action('ESTIMATE', self.program_source(), self.on_estimate_done)
+
+    def program_source(self):
+        # text of text field or open program file, which is read line by line
+        if self.program_file is not None:
+            return self.program_file
+        return self.txt_prog.get(1.0, TK.END)
+
+    def btnOpen_on_click(self, event):
+        path = askopenfilename(filetypes = (('G-code', '*.gcode *.nc *.txt'), ('all files', '*')))
+        if path:
+            self.open_program(ProgramFile(path))
+
+    def btnEdit_on_click(self, event):
+        self.close_program()
+
+    def txtProg_on_paste(self, event):
+        # large text is not inserted into the text field, layout of it freezes the gui
+        try:
+            text = self.clipboard_get()
+        except TK.TclError:
+            return None
+        if len(text) <= ControlPanel.LARGE_PASTE:
+            return None
+        self.open_program(ProgramFile.from_text(text))
+        return 'break'
+
+    def open_program(self, program):
+        """ show program file in program view, runs read it from the file """
+        if self.script_running or self.cmds_in_flight:
+            showwarning(message = 'program is running')
+            program.close()
+            return
+        self.close_program()
+        self.program_file = program
+        self.program_view.set_program(program)
+        self.txt_prog.grid_remove()
+        self.program_view.grid()
+
+    def close_program(self):
+        # back to the text field
+        if self.program_file is None or self.script_running or self.cmds_in_flight:
+            return
+        self.program_view.set_program(None)
+        self.program_lines = []
+        self.program_file.close()
+        self.program_file = None
+        self.program_view.grid_remove()
+        self.txt_prog.grid()
+
+    def txtProg_on_modified(self, event):
+        # estimate is refreshed when editing pauses
+        self.txt_prog.edit_modified(False)
+        if self._preview_job is not None:
+            self.after_cancel(self._preview_job)
+        self._preview_job = self.after(ControlPanel.PREVIEW_DELAY, self.refresh_preview)
+
+    def refresh_preview(self):
+        self._preview_job = None
+        if self.script_running or self.cmds_in_flight:
+            # bot pose changes while running, estimate is refreshed by ESTIMATE button
+            return
+        self.raise_action('ESTIMATE', self.program_source(), self.on_estimate_done)
+
+    def on_estimate_done(self, result):
+        self.lb_estimate.configure(text = '\n'.join(summary_lines(result)))
     
-    def on_cmd_done(self, result):
-        print('cmd done={}'.format(result))
-        #self.next_cmd()
-        self.cmd_running = False
+    def on_cmd_done(self, line, result):
+        # result is None for commands dropped by abort
+        print('cmd #{} done={}'.format(line, result))
+        self.cmds_in_flight -= 1
+        # commands are done in order of lines, lines of commands which failed to start are dropped too,
+        # the next one starts in the same tick
+        self._line_done = line
+        lines = self._lines_in_flight
+        while lines and lines[0] <= line:
+            lines.popleft()
+        self.program_view.set_current(lines[0] if lines else None)
+        if self.checkpoints is not None and result is not None and line >= self._next_checkpoint:
+            self._next_checkpoint = line + self.checkpoint_lines
+            self.raise_action('CHECKPOINT', line, self.checkpoints.append)
     
     def on_move_done(self, result):
         print('move done={}'.format(result))
         
     def on_mouse1_click(self, *args, **kwargs):
         print('x,y={}'.format((kwargs['x'],kwargs['y'])))
+        if (self.script_running or self.cmds_in_flight) and not self.paused:
+            # accidental click does not abort a running program, it has to be paused first
+            print('jog ignored: program is running')
+            return
+        self.jog(kwargs['x'], kwargs['y'], kwargs.get('time'))
     
 if __name__ == '__main__':
     print('__main__')
@@ -648,6 +797,8 @@ if __name__ == '__main__':
     pb = PolarBot(cp, width = 800, height = 600)
     # add visualiser as executor
     pb.add_executor(vis)
+    # stats overlay shows metrics of control panel and bot
+    vis.set_stats_mode(Visualiser.STATS_METRICS, cp.metrics)
     # enter main loop
     root.mainloop()
     # while True:
@@ -0,0 +1,62 @@
+# seek and checkpoint resume give the same state as a full run of the program, see checkpoint.py
+
+import pytest
+from headless import HeadlessControler
+from line_profile import LineProfile
+from executor import Executor
+from polarbot import PolarBot
+
+# F changes on lines 2 and 4, line 5 is out of bounds and its F is still modal
+PROGRAM = '\n'.join([
+    'G0 X300 Y300',
+    'G1 X500 Y300 F400',
+    'G1 X500 Y400',
+    'G0 X300 Y400 F50',
+    'G1 X900 Y900 F70',
+    'G1 X300 Y300',
+    'G1 X400 Y350',
+])
+
+class FeedRecorder(Executor):
+    def __init__(self):
+        self.feeds = []
+
+    def set_feed(self, feed):
+        self.feeds.append(feed)
+
+def run(line = None, checkpoint = None):
+    """ bot, profile, feeds sent to executor and checkpoints of every line of run from line """
+    profile = LineProfile(enabled = True)
+    checkpoints = []
+    controler = HeadlessControler(profile = profile, checkpoints = checkpoints, checkpoint_lines = 1)
+    bot = PolarBot(controler)
+    recorder = FeedRecorder()
+    bot.add_executor(recorder)
+    controler.load_program(PROGRAM)
+    if line is not None:
+        controler.seek(line, checkpoint)
+    controler.run()
+    return bot, profile, recorder.feeds, checkpoints
+
+@pytest.mark.parametrize('line', [3, 5, 6, 7])
+def test_seek_past_feed_change(line):
+    full_bot, full_profile, full_feeds, full_checkpoints = run()
+    # state before line is saved when the line before it is done
+    expected = next(state for state in full_checkpoints if state['line'] == line)
+    bot, profile, feeds, checkpoints = run(line)
+    assert bot.state_at(PROGRAM.split('\n'), line)['feed'] == expected['feed']
+    # bot restored the feed and sent it to executors before the first segment
+    assert feeds[0] == expected['feed']
+    for number in range(line, 8):
+        if number in full_profile.lines:
+            assert profile.lines[number].feed_s == pytest.approx(full_profile.lines[number].feed_s)
+    assert bot.feed == full_bot.feed
+    assert checkpoints[-1]['feed'] == full_checkpoints[-1]['feed']
+
+def test_resume_from_checkpoint_keeps_feed():
+    full_bot, full_profile, full_feeds, full_checkpoints = run()
+    checkpoint = next(state for state in full_checkpoints if state['line'] == 5)
+    assert checkpoint['feed'] == 50
+    bot, profile, feeds, checkpoints = run(7, checkpoint)
+    assert feeds[0] == 70
+    assert profile.lines[7].feed_s == pytest.approx(full_profile.lines[7].feed_s)
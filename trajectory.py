@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# recording and replay of joint angles and pen state of PolarBot.
+#
+# file format, little endian:
+#   header  magic b'PBTR', version u16, compression u16,
+#           rads per step f64, start angle A f64, start angle B f64,
+#           area width f64, area height f64, mount point x f64, y f64, arm length f64
+#   blocks  samples u32, position A before block i32, position B before block i32, payload length u32,
+#           payload - columns of the block, compressed as a whole:
+#               step deltas of pulley A int32[samples], of pulley B int32[samples], pen state uint8[samples]
+# positions are integer steps from the start angles, so every block decodes on its own.
+#
+# usage: trajectory.py info <file>
+#        trajectory.py play <file> [--speed N] [--start N]
+
+import os
+import sys
+import mmap
+import zlib
+import struct
+import argparse
+from array import array
+
+try:
+    import lz4.frame as lz4frame
+except ImportError:
+    lz4frame = None
+
+from executor import Executor
+from polarbot import Point
+
+MAGIC = b'PBTR'
+VERSION = 1
+HEADER = struct.Struct('<4sHHdddddddd')
+BLOCK_HEADER = struct.Struct('<IiiI')
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_LZ4 = 2
+COMPRESSIONS = {'none': COMPRESSION_NONE, 'zlib': COMPRESSION_ZLIB, 'lz4': COMPRESSION_LZ4}
+
+def _compress(data, compression):
+    if compression == COMPRESSION_ZLIB:
+        return zlib.compress(data)
+    if compression == COMPRESSION_LZ4:
+        return lz4frame.compress(data)
+    return data
+
+def _decompress(data, compression):
+    if compression == COMPRESSION_ZLIB:
+        return zlib.decompress(data)
+    if compression == COMPRESSION_LZ4:
+        if lz4frame is None:
+            raise Exception('lz4 is not installed, can not read lz4 compressed trajectory')
+        return lz4frame.decompress(data)
+    return data
+
+def _int32_column(buffer):
+    # int32 column of file is little endian
+    column = memoryview(buffer).cast('i')
+    if sys.byteorder == 'big':
+        column = array('i', column)
+        column.byteswap()
+    return column
+
+class TrajectoryRecorder(Executor):
+    """ executor writing joint angles and pen state of every step to file """
+    batch_updates = True
+    BLOCK_SIZE = 65536
+
+    def __init__(self, path, rads_per_step, compression = 'zlib'):
+        if compression not in COMPRESSIONS:
+            raise ValueError('invalid compression "{}". must be one of {}'.format(compression, tuple(COMPRESSIONS)))
+        if compression == 'lz4' and lz4frame is None:
+            raise Exception('lz4 is not installed')
+        self.path = path
+        self.rads_per_step = rads_per_step
+        self.compression = COMPRESSIONS[compression]
+        self.samples = 0
+        self._file = None
+        self._geometry = None
+        self._start = None
+        self._pen = 0
+        self._pos = (0, 0)
+        self._block_pos = (0, 0)
+        self._block_a = array('i')
+        self._block_b = array('i')
+        self._block_pen = array('B')
+
+    def init(self, width, height, mount_point, arm_len):
+        self._geometry = (width, height, mount_point.x, mount_point.y, arm_len)
+        self._file = open(self.path, 'wb')
+
+    def update(self, angleA, angleB, force_redraw = False):
+        self.update_batch(((angleA, angleB),))
+
+    def update_batch(self, angles):
+        if self._start is None:
+            self._start = angles[0]
+            self._file.write(HEADER.pack(MAGIC, VERSION, self.compression, self.rads_per_step, *self._start, *self._geometry))
+        startA, startB = self._start
+        rads = self.rads_per_step
+        posA, posB = self._pos
+        block_a, block_b, pen = self._block_a, self._block_b, self._pen
+        for angleA, angleB in angles:
+            a = round((angleA - startA) / rads)
+            b = round((angleB - startB) / rads)
+            block_a.append(a - posA)
+            block_b.append(b - posB)
+            posA, posB = a, b
+        self._block_pen.extend([pen] * len(angles))
+        self._pos = (posA, posB)
+        self.samples += len(angles)
+        if len(block_a) >= TrajectoryRecorder.BLOCK_SIZE:
+            self._write_block()
+
+    def set_tool(self, state = True):
+        self._pen = 1 if state else 0
+
+    def _write_block(self):
+        n = len(self._block_a)
+        if n == 0:
+            return
+        columns = [self._block_a, self._block_b]
+        if sys.byteorder == 'big':
+            columns = [array('i', column) for column in columns]
+            for column in columns:
+                column.byteswap()
+        payload = _compress(columns[0].tobytes() + columns[1].tobytes() + self._block_pen.tobytes(), self.compression)
+        self._file.write(BLOCK_HEADER.pack(n, self._block_pos[0], self._block_pos[1], len(payload)))
+        self._file.write(payload)
+        self._block_pos = self._pos
+        self._block_a = array('i')
+        self._block_b = array('i')
+        self._block_pen = array('B')
+
+    def close(self):
+        if self._file is None:
+            return
+        self._write_block()
+        self._file.close()
+        self._file = None
+
+class TrajectoryReader:
+    """ memory mapped trajectory file with random access to samples """
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access = mmap.ACCESS_READ)
+        magic, version, self.compression, self.rads_per_step, startA, startB, \
+            width, height, mount_x, mount_y, arm_len = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise Exception('"{}" is not a trajectory file of version {}'.format(path, VERSION))
+        self.start_angles = (startA, startB)
+        self.width = width
+        self.height = height
+        self.mount_point = (mount_x, mount_y)
+        self.arm_len = arm_len
+        # block index: (first sample, samples, position A, position B, payload offset, payload length)
+        self._blocks = []
+        first = 0
+        offset = HEADER.size
+        while offset < len(self._map):
+            n, posA, posB, length = BLOCK_HEADER.unpack_from(self._map, offset)
+            offset += BLOCK_HEADER.size
+            self._blocks.append((first, n, posA, posB, offset, length))
+            first += n
+            offset += length
+        self.samples = first
+        self._cache = (None, None)
+
+    def __len__(self):
+        return self.samples
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._cache = (None, None)
+        self._map.close()
+        self._file.close()
+
+    def _block(self, i):
+        # columns of block i, uncompressed blocks are not copied
+        if self._cache[0] == i:
+            return self._cache[1]
+        first, n, posA, posB, offset, length = self._blocks[i]
+        payload = self._map[offset:offset + length] if self.compression else memoryview(self._map)[offset:offset + length]
+        payload = _decompress(payload, self.compression)
+        columns = (_int32_column(payload[:4 * n]), _int32_column(payload[4 * n:8 * n]), payload[8 * n:9 * n])
+        self._cache = (i, columns)
+        return columns
+
+    def _find_block(self, sample):
+        lo, hi = 0, len(self._blocks) - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self._blocks[mid][0] <= sample:
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
+
+    def positions(self, start = 0, stop = None, step = 1):
+        """ yields (step position A, step position B, pen state) of samples """
+        stop = self.samples if stop is None else min(stop, self.samples)
+        if start >= stop:
+            return
+        i = self._find_block(start)
+        sample = start
+        while i < len(self._blocks) and sample < stop:
+            first, n, posA, posB, offset, length = self._blocks[i]
+            deltaA, deltaB, pen = self._block(i)
+            for j in range(n):
+                posA += deltaA[j]
+                posB += deltaB[j]
+                if first + j == sample:
+                    yield posA, posB, pen[j]
+                    sample += step
+                    if sample >= stop:
+                        return
+            i += 1
+
+    def samples_iter(self, start = 0, stop = None, step = 1):
+        """ yields (angle A, angle B, pen state) of samples """
+        startA, startB = self.start_angles
+        rads = self.rads_per_step
+        for posA, posB, pen in self.positions(start, stop, step):
+            yield startA + posA * rads, startB + posB * rads, pen
+
+class Replayer:
+    """ feeds recorded trajectory to executor """
+    def __init__(self, reader, executor):
+        self.reader = reader
+        self.executor = executor
+        self.executor.init(reader.width, reader.height, Point(*reader.mount_point), reader.arm_len)
+        self._pen = None
+        self._iter = None
+        self._budget = 0.0
+
+    def _deliver(self, angleA, angleB, pen):
+        if pen != self._pen:
+            self._pen = pen
+            self.executor.set_tool(bool(pen))
+        self.executor.update(angleA, angleB)
+
+    def run(self, start = 0, stop = None, step = 1):
+        """ replay samples without delay """
+        for sample in self.reader.samples_iter(start, stop, step):
+            self._deliver(*sample)
+
+    def play(self, widget, speed = 1.0, start = 0, tick_interval = 10):
+        """ replay with Tk timer, speed is number of recorded steps per tick
+            (1.0 is speed of the original run, one step per tick) """
+        self._iter = self.reader.samples_iter(start)
+        self._budget = 0.0
+        def tick():
+            self._budget += speed
+            sample = None
+            while self._budget >= 1:
+                self._budget -= 1
+                sample = next(self._iter, None)
+                if sample is None:
+                    return
+                # last sample of the tick and samples where pen state changes are delivered
+                if sample[2] != self._pen or self._budget < 1:
+                    self._deliver(*sample)
+            widget.after(tick_interval, tick)
+        tick()
+
+def main():
+    parser = argparse.ArgumentParser(description = 'PolarBot trajectory files')
+    parser.add_argument('command', choices = ('info', 'play'))
+    parser.add_argument('path')
+    parser.add_argument('--speed', type = float, default = 100.0, help = 'recorded steps per tick')
+    parser.add_argument('--start', type = int, default = 0, help = 'first sample to play')
+    args = parser.parse_args()
+
+    reader = TrajectoryReader(args.path)
+    if args.command == 'info':
+        print('samples={} blocks={} compression={} size={} bytes'.format(
+            len(reader), len(reader._blocks), reader.compression, os.path.getsize(args.path)))
+        return 0
+    import tkinter as TK
+    from test_canvas2 import Visualiser
+    root = TK.Tk()
+    vis = Visualiser(root, int(reader.width), int(reader.height), rads_per_step = reader.rads_per_step)
+    vis.grid(row = 1, column = 1)
+    Replayer(reader, vis).play(vis, args.speed, args.start)
+    root.mainloop()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())